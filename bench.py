@@ -0,0 +1,208 @@
+"""
+Squad Depth Chart — headless benchmarks
+python bench.py                                  # 1k / 10k / 50k players
+python bench.py --sizes 1000 200000 --leagues 40 --out bench_v9.json
+python bench.py --compare-modes                  # greedy vs optimal XI on EFLSCOTFEB26.csv
+python bench.py --parity                         # role scores vs the stored reference; exit 1 on drift
+
+Synthetic datasets use the column schema of EFLSCOTFEB26.csv. Each stage reports the
+best of --repeat runs in seconds; results go to JSON so versions can be compared.
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from depth_chart import (
+    ASSIGN_MODES, FORMATIONS, FragmentCache, _player_role_scores, assign_players, build_player_index,
+    compute_role_scores, load_dataset, make_html_page, make_mobile_html_page, memory_report, render_pitch,
+    render_pitch_png, render_pitch_svg, team_records,
+)
+
+SCHEMA_CSV=os.path.join(os.path.dirname(os.path.abspath(__file__)),"EFLSCOTFEB26.csv")
+# Role scores for EFLSCOTFEB26.csv from the original per-row compute_role_scores loop (baseline
+# 1b0a275), float64, with that loop's best-of-3 time. Written once; the current code is checked against it.
+PARITY_REF=os.path.join(os.path.dirname(os.path.abspath(__file__)),"bench_reference.npz")
+PARITY_TOL=1e-5   # scores are stored as float32; 0–100 values carry ~4e-6 rounding
+TEAMS_PER_LEAGUE=20
+POSITION_POOL=["GK","CB","LCB","RCB","LB","RB","LWB","RWB","DMF","LDMF","RDMF","LCMF","RCMF",
+               "AMF","LAMF","RAMF","LW","RW","LWF","RWF","CF"]
+
+def synthetic_csv(n:int,leagues:int,seed:int=0)->bytes:
+    """n players spread over `leagues` leagues of TEAMS_PER_LEAGUE clubs, as CSV bytes."""
+    rng=np.random.default_rng(seed)
+    cols=pd.read_csv(SCHEMA_CSV,nrows=0).columns
+    lg=rng.integers(0,leagues,n); tm=rng.integers(0,TEAMS_PER_LEAGUE,n)
+    n_pos=rng.choice([1,2,3,4],n,p=[.35,.35,.2,.1])
+    toks=rng.choice(POSITION_POOL,(n,4))
+    fixed={
+        "Player":[f"P. Player{i}" for i in range(n)],
+        "League":[f"League {k}" for k in lg],
+        "Team":[f"League {k} FC {t}" for k,t in zip(lg,tm)],
+        "Position":[", ".join(dict.fromkeys(r[:k])) for r,k in zip(toks,n_pos)],
+        "Age":rng.integers(16,39,n),
+        "Market value":rng.integers(0,200,n)*50_000,
+        "Contract expires":rng.choice(["2026-06-30","2027-06-30","2028-06-30","2029-06-30",""],n),
+        "Matches played":rng.integers(0,46,n),
+        "Minutes played":rng.integers(0,4000,n),
+        "Goals":rng.poisson(2,n),"Assists":rng.poisson(1.5,n),
+        "xG":rng.gamma(1.5,1.5,n).round(2),"xA":rng.gamma(1.2,1.2,n).round(2),
+        "Birth country":rng.choice(["England","Scotland","Wales","Ireland","France"],n),
+        "Foot":rng.choice(["right","left","both"],n,p=[.7,.25,.05]),
+        "Height":rng.integers(165,200,n),
+        "On loan":rng.choice(["no","yes"],n,p=[.9,.1]),
+    }
+    data={}
+    for c in cols:
+        if c in fixed:   data[c]=fixed[c]
+        elif "%" in c:   data[c]=rng.uniform(0,100,n).round(2)
+        else:            data[c]=rng.gamma(1.5,1.0,n).round(2)
+    buf=io.StringIO(); pd.DataFrame(data).to_csv(buf,index=False)
+    return buf.getvalue().encode()
+
+def _peak(fn)->int:
+    """Peak bytes traced (Python and numpy allocations) during one untimed call of fn."""
+    tracemalloc.start()
+    try:
+        fn(); return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def _best(fn,repeat:int)->tuple[float,object]:
+    best=float("inf"); out=None
+    for _ in range(repeat):
+        t=time.perf_counter(); out=fn(); best=min(best,time.perf_counter()-t)
+    return best,out
+
+def bench_size(n:int,leagues:int,repeat:int,teams:int)->dict:
+    raw=synthetic_csv(n,leagues)
+    res:dict={"players":n,"leagues":leagues,"csv_bytes":len(raw)}
+    res["ingest"],df=_best(lambda: load_dataset(raw),repeat)
+    res["ingest_peak_bytes"]=_peak(lambda: load_dataset(raw))
+    res["score"],rs=_best(lambda: compute_role_scores(df),repeat)
+    res["memory"]=memory_report(df,rs)
+    res["player_index"],pidx=_best(lambda: build_player_index(df,rs),repeat)
+    by_team={t:g.to_dict("records") for t,g in df.groupby("Team",observed=True)}
+    sample=sorted(by_team)[:teams]
+    res["assign"]={}
+    for fk in FORMATIONS:
+        res["assign"][fk],_=_best(lambda: [assign_players([dict(p) for p in by_team[t]],fk) for t in sample],repeat)
+    res["assign_optimal"]={}
+    for fk in FORMATIONS:
+        res["assign_optimal"][fk],_=_best(lambda: [assign_players([dict(p) for p in by_team[t]],fk,"optimal",pidx)
+                                                   for t in sample],repeat)
+    res["assign_teams"]=len(sample)
+    team=sample[0]; slots=FORMATIONS["4-2-3-1"]
+    sm,dep=assign_players([dict(p) for p in by_team[team]],"4-2-3-1")
+    args=lambda canva: (team,"League","4-2-3-1",slots,sm,dep,pidx,True,True,True,True,True,False,canva,700)
+    render=lambda canva,fc=None: render_pitch(*args(canva),fragments=fc)
+    res["render_portrait"],pitch=_best(lambda: render(False),repeat)
+    res["render_canva"],_=_best(lambda: render(True),repeat)
+    fc=FragmentCache(); render(False,fc)
+    res["render_portrait_cached"],_=_best(lambda: render(False,fc),repeat)
+    res["pitch_html_bytes"]=len(pitch.encode())
+    res["make_html_page"],_=_best(lambda: make_html_page(pitch,team,False,700).encode(),repeat)
+    res["render_svg"],_=_best(lambda: render_pitch_svg(*args(False)).encode(),repeat)
+    res["render_png"],png=_best(lambda: render_pitch_png(*args(False)),repeat)
+    res["render_png_canva"],_=_best(lambda: render_pitch_png(*args(True),scale=1),repeat)
+    res["png_bytes"]=len(png)
+    res["make_mobile_html_page"],_=_best(lambda: make_mobile_html_page(pitch,team).encode(),repeat)
+    return res
+
+def compare_assign_modes(df:pd.DataFrame,pidx)->dict:
+    """Every team × formation under each assignment mode: time, OOP starters, mean
+    starter role score, and how many starters the modes agree on."""
+    recs=team_records(df); out={m:{"seconds":0.0,"oop_starters":0,"starter_score":0.0,"starters":0}
+                                for m in ASSIGN_MODES}
+    xi:dict[str,dict]={m:{} for m in ASSIGN_MODES}
+    for m in ASSIGN_MODES:
+        r=out[m]
+        for team,players in recs.items():
+            for fk in FORMATIONS:
+                t=time.perf_counter()
+                sm,_=assign_players([dict(p) for p in players],fk,m,pidx)
+                r["seconds"]+=time.perf_counter()-t
+                for sid,ps in sm.items():
+                    if not ps: continue
+                    s=ps[0]; sc=_player_role_scores(s,pidx)
+                    r["starters"]+=1; r["oop_starters"]+=bool(s["_oop"])
+                    r["starter_score"]+=max(sc.values()) if sc else 0.0
+                    xi[m][(team,fk,sid)]=s["_key"]
+        r["starter_score"]/=max(r["starters"],1)
+    a,b=(xi[m] for m in ASSIGN_MODES)
+    out["same_starter"]=sum(a.get(k)==v for k,v in b.items())/max(len(b),1)
+    out["pairs"]=len(recs)*len(FORMATIONS)
+    return out
+
+def check_parity(repeat:int)->dict:
+    """compute_role_scores on EFLSCOTFEB26.csv against PARITY_REF: same columns, identical
+    NaN pattern, every score within PARITY_TOL, and the time against the reference loop's."""
+    with open(SCHEMA_CSV,"rb") as f: raw=f.read()
+    with np.load(PARITY_REF,allow_pickle=False) as z:
+        ref=z["rs"]; cols=[str(c) for c in z["cols"]]; ref_s=float(z["seconds"]); sha=str(z["csv_sha256"])
+    if hashlib.sha256(raw).hexdigest()!=sha: raise SystemExit(f"{SCHEMA_CSV} differs from the one {PARITY_REF} was built on")
+    df=load_dataset(raw)
+    secs,rs=_best(lambda: compute_role_scores(df),repeat)
+    cur=rs.reindex(columns=cols).to_numpy(dtype=np.float64)
+    nan_same=bool((np.isnan(cur)==np.isnan(ref)).all()) and list(rs.columns)==cols
+    both=~(np.isnan(cur)|np.isnan(ref))
+    max_diff=float(np.abs(cur[both]-ref[both]).max()) if both.any() else 0.0
+    return {"ok":nan_same and max_diff<=PARITY_TOL,"nan_pattern_identical":nan_same,"max_abs_diff":max_diff,
+            "tolerance":PARITY_TOL,"scores":int(both.sum()),"seconds":secs,"reference_seconds":ref_s}
+
+def _git_rev()->str|None:
+    try:
+        return subprocess.run(["git","rev-parse","--short","HEAD"],capture_output=True,text=True,
+                              check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+def main(argv=None)->dict:
+    ap=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes",type=int,nargs="+",default=[1_000,10_000,50_000])
+    ap.add_argument("--leagues",type=int,default=8)
+    ap.add_argument("--repeat",type=int,default=3)
+    ap.add_argument("--teams",type=int,default=10,help="teams per formation in the assign stage")
+    ap.add_argument("--out",default="bench_results.json")
+    ap.add_argument("--compare-modes",action="store_true",help="greedy vs optimal on EFLSCOTFEB26.csv only")
+    ap.add_argument("--parity",action="store_true",help="role scores vs the stored reference on EFLSCOTFEB26.csv")
+    a=ap.parse_args(argv)
+    if a.parity:
+        r=check_parity(a.repeat)
+        print(f"parity {'ok' if r['ok'] else 'FAILED'}: NaN pattern {'identical' if r['nan_pattern_identical'] else 'differs'}, "
+              f"max diff {r['max_abs_diff']:.1e} (tol {r['tolerance']:.0e}) over {r['scores']:,} scores")
+        print(f"score {r['seconds']:.3f}s vs reference loop {r['reference_seconds']:.3f}s "
+              f"({r['reference_seconds']/r['seconds']:.0f}x)")
+        if not r["ok"]: raise SystemExit(1)
+        return r
+    if a.compare_modes:
+        df=load_dataset(SCHEMA_CSV); pidx=build_player_index(df,compute_role_scores(df))
+        cmp=compare_assign_modes(df,pidx)
+        for m in ASSIGN_MODES:
+            r=cmp[m]
+            print(f"{m:>8}  {r['seconds']:.2f}s over {cmp['pairs']} team x formation  "
+                  f"OOP starters {r['oop_starters']}/{r['starters']}  mean starter score {r['starter_score']:.1f}")
+        print(f"same starter in {cmp['same_starter']:.0%} of slots")
+        return cmp
+    report={"git_rev":_git_rev(),"timestamp":datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python":platform.python_version(),"pandas":pd.__version__,"numpy":np.__version__,
+            "machine":platform.machine(),"results":[]}
+    for n in a.sizes:
+        r=bench_size(n,a.leagues,a.repeat,a.teams); report["results"].append(r)
+        print(f"{n:>8,} players  ingest {r['ingest']:.3f}s  score {r['score']:.3f}s  "
+              f"assign {sum(r['assign'].values())/len(r['assign'])*1000:.1f}ms/{r['assign_teams']} teams  "
+              f"render {r['render_portrait']*1000:.1f}ms  html {r['pitch_html_bytes']/1024:.1f}KB  "
+              f"ingest peak {r['ingest_peak_bytes']/1e6:.1f}MB  {r['memory']['per_player']:,} B/player")
+    with open(a.out,"w") as f: json.dump(report,f,indent=2)
+    print(f"wrote {a.out}")
+    return report
+
+if __name__=="__main__":
+    main()
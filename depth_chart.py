@@ -0,0 +1,1963 @@
+"""
+Squad Depth Chart — engine
+Role scoring, slot assignment and pitch rendering, with no Streamlit dependency
+so scripts and worker processes can import it. app.py is the UI on top.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from functools import lru_cache
+from types import MappingProxyType
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+# ── Role Buckets ───────────────────────────────────────────────────────────────
+ROLE_BUCKETS: dict[str,dict] = {
+    "GK":{
+        "Shot Stopper GK":{"metrics":{"Prevented goals per 90":3,"Save rate, %":1}},
+        "Ball Playing GK":{"metrics":{"Passes per 90":1,"Accurate passes, %":3,"Accurate long passes, %":2}},
+        "Sweeper GK":     {"metrics":{"Exits per 90":1}},
+    },
+    "CB":{
+        "Ball Playing CB":{"metrics":{"Passes per 90":2,"Accurate passes, %":2,"Forward passes per 90":2,
+            "Accurate forward passes, %":2,"Progressive passes per 90":2,"Progressive runs per 90":1.5,
+            "Dribbles per 90":1.5,"Accurate long passes, %":1,"Passes to final third per 90":1.5}},
+        "Wide CB":        {"metrics":{"Defensive duels per 90":1.5,"Defensive duels won, %":2,
+            "Dribbles per 90":2,"Forward passes per 90":1,"Progressive passes per 90":1,"Progressive runs per 90":2}},
+        "Box Defender":   {"metrics":{"Aerial duels per 90":1,"Aerial duels won, %":3,
+            "PAdj Interceptions":2,"Shots blocked per 90":1,"Defensive duels won, %":4}},
+    },
+    "FB":{
+        "Build Up FB":  {"metrics":{"Passes per 90":2,"Accurate passes, %":1.5,"Forward passes per 90":2,
+            "Accurate forward passes, %":2,"Progressive passes per 90":2.5,"Progressive runs per 90":2,
+            "Dribbles per 90":2,"Passes to final third per 90":2,"xA per 90":1}},
+        "Attacking FB": {"metrics":{"Crosses per 90":2,"Dribbles per 90":3.5,"Accelerations per 90":1,
+            "Successful dribbles, %":1,"Touches in box per 90":2,"Progressive runs per 90":3,
+            "Passes to penalty area per 90":2,"xA per 90":3}},
+        "Defensive FB": {"metrics":{"Aerial duels per 90":1,"Aerial duels won, %":1.5,
+            "Defensive duels per 90":2,"PAdj Interceptions":3,"Shots blocked per 90":1,"Defensive duels won, %":3.5}},
+    },
+    "CM":{
+        "Deep Playmaker CM":    {"metrics":{"Passes per 90":1,"Accurate passes, %":1,"Forward passes per 90":2,
+            "Accurate forward passes, %":1.5,"Progressive passes per 90":3,"Passes to final third per 90":2.5,
+            "Accurate long passes, %":1}},
+        "Advanced Playmaker CM":{"metrics":{"Deep completions per 90":1.5,"Smart passes per 90":2,
+            "xA per 90":4,"Passes to penalty area per 90":2}},
+        "Defensive CM":         {"metrics":{"Defensive duels per 90":4,"Defensive duels won, %":4,
+            "PAdj Interceptions":3,"Aerial duels per 90":0.5,"Aerial duels won, %":1}},
+        "Ball Carrying CM":     {"metrics":{"Dribbles per 90":4,"Successful dribbles, %":2,
+            "Progressive runs per 90":3,"Accelerations per 90":3}},
+    },
+    "ATT":{
+        "Playmaker ATT":   {"metrics":{"Passes per 90":2,"xA per 90":3,"Key passes per 90":1,
+            "Deep completions per 90":1.5,"Smart passes per 90":1.5,"Passes to penalty area per 90":2}},
+        "Goal Threat ATT": {"metrics":{"xG per 90":3,"Non-penalty goals per 90":3,"Shots per 90":2,"Touches in box per 90":2}},
+        "Ball Carrier ATT":{"metrics":{"Dribbles per 90":4,"Successful dribbles, %":2,
+            "Progressive runs per 90":3,"Accelerations per 90":3}},
+    },
+    "CF":{
+        "Target Man CF":  {"metrics":{"Aerial duels per 90":3,"Aerial duels won, %":5}},
+        "Goal Threat CF": {"metrics":{"Non-penalty goals per 90":3,"Shots per 90":1.5,"xG per 90":3,
+            "Touches in box per 90":1,"Shots on target, %":0.5}},
+        "Link Up CF":     {"metrics":{"Passes per 90":2,"Passes to penalty area per 90":1.5,
+            "Deep completions per 90":1,"Smart passes per 90":1.5,"Accurate passes, %":1.5,
+            "Key passes per 90":1,"Dribbles per 90":2,"Successful dribbles, %":1,
+            "Progressive runs per 90":2,"xA per 90":3}},
+    },
+}
+ROLE_KEY_MAP:dict[str,str]={
+    "GK":"GK","CB":"CB","LCB":"CB","RCB":"CB",
+    "LB":"FB","RB":"FB","LWB":"FB","RWB":"FB",
+    "DMF":"CM","LDMF":"CM","RDMF":"CM","LCMF":"CM","RCMF":"CM",
+    "AMF":"ATT","LAMF":"ATT","LW":"ATT","LWF":"ATT","RAMF":"ATT","RW":"ATT","RWF":"ATT",
+    "CF":"CF",
+}
+POS_POOL_MAP:dict[str,list]={
+    "GK":["GK"],"CB":["CB","LCB","RCB"],"FB":["LB","RB","LWB","RWB"],
+    "CM":["DMF","LDMF","RDMF","LCMF","RCMF"],
+    "ATT":["AMF","LAMF","RAMF","LW","LWF","RW","RWF"],"CF":["CF"],
+}
+CANONICAL:dict[str,str]={
+    "GK":"GK","CB":"CB","LCB":"LCB","RCB":"RCB",
+    "LB":"LB","LWB":"LWB","RB":"RB","RWB":"RWB",
+    "DMF":"DM","LDMF":"DM","RDMF":"DM","LCMF":"CM","RCMF":"CM",
+    "AMF":"AM","LAMF":"LW","LW":"LW","LWF":"LW",
+    "RAMF":"RW","RW":"RW","RWF":"RW","CF":"ST",
+}
+SIDE_PREF:dict[str,str]={
+    "RCB":"R","RCMF":"R","RDMF":"R","RB":"R","RWB":"R","RW":"R","RWF":"R","RAMF":"R",
+    "LCB":"L","LCMF":"L","LDMF":"L","LB":"L","LWB":"L","LW":"L","LWF":"L","LAMF":"L",
+}
+
+# Compiled once: role key → (role names, metric names, roles × metrics weight matrix).
+# A zero weight means the role ignores that metric, so each row doubles as the role's mask.
+def _compile_role_weights(buckets:dict)->dict[str,tuple[list,list,np.ndarray]]:
+    out={}
+    for rk,roles in buckets.items():
+        names=list(roles)
+        mets=list(dict.fromkeys(m for spec in roles.values() for m in spec.get("metrics",{})))
+        W=np.zeros((len(names),len(mets)))
+        for i,rn in enumerate(names):
+            for m,w in roles[rn].get("metrics",{}).items(): W[i,mets.index(m)]=float(w)
+        out[rk]=(names,mets,W)
+    return out
+ROLE_WEIGHTS:dict[str,tuple[list,list,np.ndarray]]=_compile_role_weights(ROLE_BUCKETS)
+ROLE_SCORE_COLS:list[str]=[f"_rs_{rn}" for names,_,_ in ROLE_WEIGHTS.values() for rn in names]
+ROLE_METRICS:frozenset[str]=frozenset(m for _,mets,_ in ROLE_WEIGHTS.values() for m in mets)
+ROLE_COL_POS:dict[str,int]={c[4:]:i for i,c in enumerate(ROLE_SCORE_COLS)}
+
+# ── Position records ──────────────────────────────────────────────────────────
+# Each distinct position string is parsed once; players share the resulting record.
+class PosRecord(NamedTuple):
+    tok:str        # first token, e.g. "LCB"
+    toks:tuple     # every token in listed order
+    canon:str      # slot label of the first token
+    side:str       # "L", "R" or "N"
+    role:str       # ROLE_BUCKETS key
+    multi:bool     # four or more listed positions
+
+@lru_cache(maxsize=None)
+def _parse_position(pos:str)->PosRecord:
+    tok=pos.split(",")[0].strip().upper()
+    toks=tuple(t.strip().upper() for t in pos.split(",") if t.strip())
+    return PosRecord(tok,toks,CANONICAL.get(tok,"CM"),SIDE_PREF.get(tok,"N"),
+                     ROLE_KEY_MAP.get(tok,"ATT"),len(toks)>=4)
+
+def parse_position(pos)->PosRecord: return _parse_position(str(pos))
+def pos_record(p:dict)->PosRecord:  return _parse_position(str(p.get("Position","")))
+
+def _tok(pos:str)->str:       return parse_position(pos).tok
+def _canon(pos:str)->str:     return parse_position(pos).canon
+def _side(pos:str)->str:      return parse_position(pos).side
+def _role_key(pos:str)->str:  return parse_position(pos).role
+def _all_toks(pos:str)->list: return list(parse_position(pos).toks)
+def _multi_role(pos:str)->bool: return parse_position(pos).multi
+
+# Frame columns holding the record's scalar fields, for vectorized filtering and grouping
+POSITION_COLS:dict[str,str]={"_ftok":"tok","_canon":"canon","_side":"side","_role":"role","_multi":"multi"}
+
+def add_position_cols(df:pd.DataFrame)->pd.DataFrame:
+    """Parse each distinct Position once and broadcast the record fields to every row by code."""
+    pos=df["Position"] if isinstance(df["Position"].dtype,pd.CategoricalDtype) else df["Position"].astype("category")
+    recs=[parse_position(c) for c in pos.cat.categories]+[parse_position("")]
+    codes=pos.cat.codes.to_numpy()   # -1 (missing Position) picks the trailing "" record
+    for col,field in POSITION_COLS.items():
+        vals=[getattr(r,field) for r in recs]
+        if field=="multi": df[col]=np.array(vals,dtype=bool)[codes]; continue
+        cat=pd.Categorical(vals)
+        df[col]=pd.Categorical.from_codes(cat.codes[codes],cat.categories)
+    return df
+
+FORMATIONS:dict[str,list[dict]]={
+    "4-2-3-1":[
+        {"id":"ST",  "label":"ST",  "x":50,"y":14,  "accepts":["ST"],             "side":"N"},
+        {"id":"LW",  "label":"LW",  "x":13,"y":30, "accepts":["LW"],             "side":"L","native_toks":["LW","LWF","LAMF"]},
+        {"id":"AM",  "label":"AM",  "x":50,"y":32, "accepts":["AM"],             "side":"N","priority_toks":["AMF"],"native_toks":["AMF"]},
+        {"id":"RW",  "label":"RW",  "x":87,"y":30, "accepts":["RW"],             "side":"R","native_toks":["RW","RWF","RAMF"]},
+        {"id":"DM",  "label":"DM",  "x":35,"y":51, "accepts":["DM"],             "side":"L"},
+        {"id":"CM",  "label":"CM",  "x":65,"y":51, "accepts":["CM"],             "side":"R"},
+        {"id":"LB",  "label":"LB",  "x":12,"y":66, "accepts":["LB","LWB"],       "side":"L","wb_only":True},
+        {"id":"CB1", "label":"CB",  "x":32,"y":72, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":68,"y":72, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RB",  "label":"RB",  "x":88,"y":66, "accepts":["RB","RWB"],       "side":"R","wb_only":True},
+        {"id":"GK",  "label":"GK",  "x":50,"y":89, "accepts":["GK"],             "side":"N"},
+    ],
+    "4-3-3":[
+        {"id":"ST",  "label":"ST",  "x":50,"y":14,  "accepts":["ST"],             "side":"N"},
+        {"id":"LW",  "label":"LW",  "x":14,"y":21, "accepts":["LW"],             "side":"L","native_toks":["LW","LWF","LAMF"]},
+        {"id":"RW",  "label":"RW",  "x":86,"y":21, "accepts":["RW"],             "side":"R","native_toks":["RW","RWF","RAMF"]},
+        {"id":"CM",  "label":"CM",  "x":22,"y":41, "accepts":["CM"],             "side":"L"},
+        {"id":"DM",  "label":"DM",  "x":50,"y":49, "accepts":["DM"],             "side":"N"},
+        {"id":"AM",  "label":"AM",  "x":78,"y":41, "accepts":["AM"],             "side":"R"},
+        {"id":"LB",  "label":"LB",  "x":12,"y":66, "accepts":["LB","LWB"],       "side":"L","wb_only":True},
+        {"id":"CB1", "label":"CB",  "x":32,"y":72, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":68,"y":72, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RB",  "label":"RB",  "x":88,"y":66, "accepts":["RB","RWB"],       "side":"R","wb_only":True},
+        {"id":"GK",  "label":"GK",  "x":50,"y":89, "accepts":["GK"],             "side":"N"},
+    ],
+    "4-4-2":[
+        {"id":"ST1", "label":"ST",  "x":35,"y":14,  "accepts":["ST"],             "side":"L"},
+        {"id":"ST2", "label":"ST",  "x":65,"y":14,  "accepts":["ST"],             "side":"R"},
+        {"id":"LW",  "label":"LW",  "x":9, "y":39, "accepts":["LW"],             "side":"L","native_toks":["LW","LWF","LAMF"]},
+        {"id":"CM1", "label":"CM",  "x":34,"y":43, "accepts":["CM"],             "side":"L"},
+        {"id":"CM2", "label":"CM",  "x":66,"y":43, "accepts":["CM"],             "side":"R"},
+        {"id":"RW",  "label":"RW",  "x":91,"y":39, "accepts":["RW"],             "side":"R","native_toks":["RW","RWF","RAMF"]},
+        {"id":"LB",  "label":"LB",  "x":12,"y":66, "accepts":["LB","LWB"],       "side":"L","wb_only":True},
+        {"id":"CB1", "label":"CB",  "x":32,"y":72, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":68,"y":72, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RB",  "label":"RB",  "x":88,"y":66, "accepts":["RB","RWB"],       "side":"R","wb_only":True},
+        {"id":"GK",  "label":"GK",  "x":50,"y":89, "accepts":["GK"],             "side":"N"},
+    ],
+    "3-5-2":[
+        {"id":"ST1", "label":"ST",  "x":35,"y":14,  "accepts":["ST"],             "side":"L"},
+        {"id":"ST2", "label":"ST",  "x":65,"y":14,  "accepts":["ST"],             "side":"R"},
+        {"id":"LWB", "label":"LWB", "x":13,"y":37, "accepts":["LWB","LB"],       "side":"L","wb_only":True},
+        {"id":"AM",  "label":"AM",  "x":30,"y":41, "accepts":["AM"],             "side":"L"},
+        {"id":"DM",  "label":"DM",  "x":50,"y":48, "accepts":["DM"],             "side":"N"},
+        {"id":"CM",  "label":"CM",  "x":70,"y":41, "accepts":["CM"],             "side":"R"},
+        {"id":"RWB", "label":"RWB", "x":87,"y":37, "accepts":["RWB","RB"],       "side":"R","wb_only":True},
+        {"id":"LCB", "label":"LCB", "x":25,"y":67, "accepts":["LCB","CB"],       "side":"L"},
+        {"id":"CB",  "label":"CB",  "x":50,"y":71, "accepts":["CB","LCB","RCB"], "side":"N"},
+        {"id":"RCB", "label":"RCB", "x":75,"y":67, "accepts":["RCB","CB"],       "side":"R"},
+        {"id":"GK",  "label":"GK",  "x":50,"y":88, "accepts":["GK"],             "side":"N"},
+    ],
+    "3-4-1-2":[
+        {"id":"ST1", "label":"ST",  "x":35,"y":13,  "accepts":["ST"],             "side":"L"},
+        {"id":"ST2", "label":"ST",  "x":65,"y":13,  "accepts":["ST"],             "side":"R"},
+        {"id":"AM",  "label":"AM",  "x":50,"y":25, "accepts":["AM","LW","RW"],   "side":"N","priority_toks":["AMF"],"native_toks":["AMF"]},
+        {"id":"LWB", "label":"LWB", "x":13,"y":40, "accepts":["LWB","LB"],       "side":"L","wb_only":True},
+        {"id":"CM1", "label":"CM",  "x":34,"y":44, "accepts":["CM"],             "side":"L"},
+        {"id":"CM2", "label":"CM",  "x":66,"y":44, "accepts":["CM"],             "side":"R"},
+        {"id":"RWB", "label":"RWB", "x":87,"y":40, "accepts":["RWB","RB"],       "side":"R","wb_only":True},
+        {"id":"LCB", "label":"LCB", "x":25,"y":66, "accepts":["LCB","CB"],       "side":"L"},
+        {"id":"CB",  "label":"CB",  "x":50,"y":70, "accepts":["CB","LCB","RCB"], "side":"N"},
+        {"id":"RCB", "label":"RCB", "x":75,"y":66, "accepts":["RCB","CB"],       "side":"R"},
+        {"id":"GK",  "label":"GK",  "x":50,"y":87, "accepts":["GK"],             "side":"N"},
+    ],
+    "3-4-3":[
+        {"id":"LW",  "label":"LW",  "x":14,"y":21, "accepts":["LW"],             "side":"L","native_toks":["LW","LWF","LAMF"]},
+        {"id":"ST",  "label":"ST",  "x":50,"y":14,  "accepts":["ST"],             "side":"N"},
+        {"id":"RW",  "label":"RW",  "x":86,"y":21, "accepts":["RW"],             "side":"R","native_toks":["RW","RWF","RAMF"]},
+        {"id":"LWB", "label":"LWB", "x":13,"y":45, "accepts":["LWB","LB"],       "side":"L","wb_only":True},
+        {"id":"CM",  "label":"CM",  "x":38,"y":43, "accepts":["CM"],             "side":"L"},
+        {"id":"DM",  "label":"DM",  "x":62,"y":43, "accepts":["DM"],             "side":"R"},
+        {"id":"RWB", "label":"RWB", "x":87,"y":45, "accepts":["RWB","RB"],       "side":"R","wb_only":True},
+        {"id":"LCB", "label":"LCB", "x":25,"y":67, "accepts":["LCB","CB"],       "side":"L"},
+        {"id":"CB",  "label":"CB",  "x":50,"y":71, "accepts":["CB","LCB","RCB"], "side":"N"},
+        {"id":"RCB", "label":"RCB", "x":75,"y":67, "accepts":["RCB","CB"],       "side":"R"},
+        {"id":"GK",  "label":"GK",  "x":50,"y":88, "accepts":["GK"],             "side":"N"},
+    ],
+    "4-1-4-1":[
+        {"id":"ST",  "label":"ST",  "x":50,"y":14,  "accepts":["ST"],             "side":"N"},
+        {"id":"LW",  "label":"LW",  "x":9, "y":31, "accepts":["LW"],             "side":"L","native_toks":["LW","LWF","LAMF"]},
+        {"id":"AM",  "label":"AM",  "x":30,"y":38, "accepts":["AM"],             "side":"L","priority_toks":["AMF"],"native_toks":["AMF"]},
+        {"id":"DM",  "label":"DM",  "x":50,"y":41, "accepts":["DM"],             "side":"N"},
+        {"id":"CM",  "label":"CM",  "x":70,"y":38, "accepts":["CM"],             "side":"R"},
+        {"id":"RW",  "label":"RW",  "x":91,"y":31, "accepts":["RW"],             "side":"R","native_toks":["RW","RWF","RAMF"]},
+        {"id":"LB",  "label":"LB",  "x":12,"y":66, "accepts":["LB","LWB"],       "side":"L","wb_only":True},
+        {"id":"CB1", "label":"CB",  "x":32,"y":72, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":68,"y":72, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RB",  "label":"RB",  "x":88,"y":66, "accepts":["RB","RWB"],       "side":"R","wb_only":True},
+        {"id":"GK",  "label":"GK",  "x":50,"y":89, "accepts":["GK"],             "side":"N"},
+    ],
+    "4-2-3-1 (CM)":[
+        {"id":"ST",  "label":"ST",  "x":50,"y":14,  "accepts":["ST"],             "side":"N"},
+        {"id":"LW",  "label":"LW",  "x":13,"y":30, "accepts":["LW"],             "side":"L","native_toks":["LW","LWF","LAMF"]},
+        {"id":"AM",  "label":"AM",  "x":50,"y":32, "accepts":["AM"],             "side":"N","priority_toks":["AMF"],"native_toks":["AMF"]},
+        {"id":"RW",  "label":"RW",  "x":87,"y":30, "accepts":["RW"],             "side":"R","native_toks":["RW","RWF","RAMF"]},
+        {"id":"LCM", "label":"CM",  "x":35,"y":51, "accepts":["CM"],             "side":"L"},
+        {"id":"RCM", "label":"CM",  "x":65,"y":51, "accepts":["CM"],             "side":"R"},
+        {"id":"LB",  "label":"LB",  "x":12,"y":66, "accepts":["LB","LWB"],       "side":"L","wb_only":True},
+        {"id":"CB1", "label":"CB",  "x":32,"y":72, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":68,"y":72, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RB",  "label":"RB",  "x":88,"y":66, "accepts":["RB","RWB"],       "side":"R","wb_only":True},
+        {"id":"GK",  "label":"GK",  "x":50,"y":89, "accepts":["GK"],             "side":"N"},
+    ],
+    "4-3-3 (CM)":[
+        {"id":"ST",  "label":"ST",  "x":50,"y":14,  "accepts":["ST"],             "side":"N"},
+        {"id":"LW",  "label":"LW",  "x":14,"y":21, "accepts":["LW"],             "side":"L","native_toks":["LW","LWF","LAMF"]},
+        {"id":"RW",  "label":"RW",  "x":86,"y":21, "accepts":["RW"],             "side":"R","native_toks":["RW","RWF","RAMF"]},
+        {"id":"CM1", "label":"CM",  "x":22,"y":41, "accepts":["CM"],             "side":"L"},
+        {"id":"DM",  "label":"DM",  "x":50,"y":49, "accepts":["DM"],             "side":"N"},
+        {"id":"CM2", "label":"CM",  "x":78,"y":41, "accepts":["CM"],             "side":"R"},
+        {"id":"LB",  "label":"LB",  "x":12,"y":66, "accepts":["LB","LWB"],       "side":"L","wb_only":True},
+        {"id":"CB1", "label":"CB",  "x":32,"y":72, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":68,"y":72, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RB",  "label":"RB",  "x":88,"y":66, "accepts":["RB","RWB"],       "side":"R","wb_only":True},
+        {"id":"GK",  "label":"GK",  "x":50,"y":89, "accepts":["GK"],             "side":"N"},
+    ],
+    "4-3-1-2":[
+        {"id":"ST1", "label":"ST",  "x":35,"y":14,  "accepts":["ST"],             "side":"L"},
+        {"id":"ST2", "label":"ST",  "x":65,"y":14,  "accepts":["ST"],             "side":"R"},
+        {"id":"AM",  "label":"AM",  "x":50,"y":28, "accepts":["AM"],             "side":"N","priority_toks":["AMF"],"native_toks":["AMF"]},
+        {"id":"CM1", "label":"CM",  "x":22,"y":42, "accepts":["CM"],             "side":"L"},
+        {"id":"DM",  "label":"DM",  "x":50,"y":48, "accepts":["DM"],             "side":"N"},
+        {"id":"CM2", "label":"CM",  "x":78,"y":42, "accepts":["CM"],             "side":"R"},
+        {"id":"LB",  "label":"LB",  "x":12,"y":66, "accepts":["LB","LWB"],       "side":"L","wb_only":True},
+        {"id":"CB1", "label":"CB",  "x":32,"y":72, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":68,"y":72, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RB",  "label":"RB",  "x":88,"y":66, "accepts":["RB","RWB"],       "side":"R","wb_only":True},
+        {"id":"GK",  "label":"GK",  "x":50,"y":89, "accepts":["GK"],             "side":"N"},
+    ],
+    "3-4-2-1":[
+        {"id":"ST",  "label":"ST",  "x":50,"y":14,  "accepts":["ST"],             "side":"N"},
+        {"id":"LAM", "label":"AM",  "x":22,"y":24, "accepts":["LW","AM"],        "side":"L","native_toks":["LW","LWF","LAMF","AMF"]},
+        {"id":"RAM", "label":"AM",  "x":78,"y":24, "accepts":["RW","AM"],        "side":"R","native_toks":["RW","RWF","RAMF","AMF"]},
+        {"id":"LWB", "label":"LWB", "x":13,"y":45, "accepts":["LWB","LB"],       "side":"L","wb_only":True},
+        {"id":"CM",  "label":"CM",  "x":38,"y":43, "accepts":["CM"],             "side":"L"},
+        {"id":"DM",  "label":"DM",  "x":62,"y":43, "accepts":["DM"],             "side":"R"},
+        {"id":"RWB", "label":"RWB", "x":87,"y":45, "accepts":["RWB","RB"],       "side":"R","wb_only":True},
+        {"id":"LCB", "label":"LCB", "x":25,"y":67, "accepts":["LCB","CB"],       "side":"L"},
+        {"id":"CB",  "label":"CB",  "x":50,"y":71, "accepts":["CB","LCB","RCB"], "side":"N"},
+        {"id":"RCB", "label":"RCB", "x":75,"y":67, "accepts":["RCB","CB"],       "side":"R"},
+        {"id":"GK",  "label":"GK",  "x":50,"y":88, "accepts":["GK"],             "side":"N"},
+    ],
+    "5-3-2":[
+        {"id":"ST1", "label":"ST",  "x":35,"y":14,  "accepts":["ST"],             "side":"L"},
+        {"id":"ST2", "label":"ST",  "x":65,"y":14,  "accepts":["ST"],             "side":"R"},
+        {"id":"LWB", "label":"LWB", "x":13,"y":53, "accepts":["LWB","LB"],       "side":"L","wb_only":True},
+        {"id":"CM1", "label":"CM",  "x":30,"y":41, "accepts":["CM"],             "side":"L"},
+        {"id":"DM",  "label":"DM",  "x":50,"y":48, "accepts":["DM"],             "side":"N"},
+        {"id":"CM2", "label":"CM",  "x":70,"y":41, "accepts":["CM"],             "side":"R"},
+        {"id":"RWB", "label":"RWB", "x":87,"y":53, "accepts":["RWB","RB"],       "side":"R","wb_only":True},
+        {"id":"LCB", "label":"LCB", "x":17,"y":69, "accepts":["LCB","CB"],       "side":"L"},
+        {"id":"CB1", "label":"CB",  "x":37,"y":73, "accepts":["CB","LCB","RCB"], "side":"L"},
+        {"id":"CB2", "label":"CB",  "x":63,"y":73, "accepts":["CB","LCB","RCB"], "side":"R"},
+        {"id":"RCB", "label":"RCB", "x":83,"y":69, "accepts":["RCB","CB"],       "side":"R"},
+        {"id":"GK",  "label":"GK",  "x":50,"y":88, "accepts":["GK"],             "side":"N"},
+    ],
+}
+
+PITCH_ORDER=["GK","LCB","CB","RCB","LB","RB","LWB","RWB","CM","DM","AM","LW","RW","ST"]
+
+# ── Compiled formation tables ─────────────────────────────────────────────────
+# Built once at import so assign_players never scans slot lists. Slot i of a
+# formation is bit i of every mask; a token's mask is the slots it may start in.
+WB_TOKS=frozenset({"LB","LWB","RB","RWB"})
+FOUR_BACK_FORMATIONS=frozenset({"4-2-3-1","4-2-3-1 (CM)","4-3-3","4-3-3 (CM)","4-3-1-2","4-4-2","4-1-4-1","3-4-3"})
+THREE_BACK_FORMATIONS=frozenset({"3-5-2","3-4-1-2","3-4-3","3-4-2-1"})
+SIDE_ORDER={"L":0,"N":1,"R":2}
+
+class FormationTable(NamedTuple):
+    slots:tuple                # slot dicts in FORMATIONS order
+    index:MappingProxyType     # slot id → bit index
+    by_id:MappingProxyType     # slot id → slot dict
+    by_label:MappingProxyType  # label → slots, formation order
+    label_ids:MappingProxyType # label → slot ids
+    label_mask:MappingProxyType# label → bitmask of its slots
+    by_side:MappingProxyType   # label → slots ordered L, N, R
+    accepts:MappingProxyType   # slot id → frozenset of canonical labels
+    native_toks:MappingProxyType # slot id → frozenset of raw tokens, or None
+    priority_toks:MappingProxyType # label → frozenset union over its slots
+    first_mask:MappingProxyType    # first token → slots it fits as primary
+    second_mask:MappingProxyType   # secondary token → slots it may fill (no wb_only)
+    first_default:int              # masks for tokens outside CANONICAL (canon "CM")
+    second_default:int
+
+    def first_fits(self,tok:str)->int:  return self.first_mask.get(tok,self.first_default)
+    def second_fits(self,tok:str)->int: return self.second_mask.get(tok,self.second_default)
+
+def _compile_formation(slots:list[dict])->FormationTable:
+    def mask(tok:str,primary:bool)->int:
+        canon=CANONICAL.get(tok,"CM"); m=0
+        for i,s in enumerate(slots):
+            if s.get("wb_only") and (not primary or tok not in WB_TOKS): continue
+            if canon in s["accepts"]: m|=1<<i
+        return m
+    by_label:dict[str,list]={}
+    for s in slots: by_label.setdefault(s["label"],[]).append(s)
+    index={s["id"]:i for i,s in enumerate(slots)}
+    fz=lambda d: MappingProxyType({k:tuple(v) for k,v in d.items()})
+    return FormationTable(
+        slots=tuple(slots),index=MappingProxyType(index),
+        by_id=MappingProxyType({s["id"]:s for s in slots}),
+        by_label=fz(by_label),
+        label_ids=fz({l:[s["id"] for s in ss] for l,ss in by_label.items()}),
+        label_mask=MappingProxyType({l:sum(1<<index[s["id"]] for s in ss) for l,ss in by_label.items()}),
+        by_side=fz({l:sorted(ss,key=lambda s:SIDE_ORDER[s["side"]]) for l,ss in by_label.items()}),
+        accepts=MappingProxyType({s["id"]:frozenset(s["accepts"]) for s in slots}),
+        native_toks=MappingProxyType({s["id"]:frozenset(s["native_toks"]) if "native_toks" in s else None for s in slots}),
+        priority_toks=MappingProxyType({l:frozenset(t for s in ss for t in s.get("priority_toks",[])) for l,ss in by_label.items()}),
+        first_mask=MappingProxyType({t:mask(t,True) for t in CANONICAL}),
+        second_mask=MappingProxyType({t:mask(t,False) for t in CANONICAL}),
+        first_default=mask("",True),second_default=mask("",False))
+
+FORMATION_TABLES:MappingProxyType=MappingProxyType({fk:_compile_formation(v) for fk,v in FORMATIONS.items()})
+
+# ── Helpers ────────────────────────────────────────────────────────────────────
+def contract_years(s)->int:
+    s=str(s or "").strip()
+    if s in ("","nan","NaT"): return -1
+    m=re.search(r"(20\d{2})",s)
+    return max(0,int(m.group(1))-date.today().year) if m else -1
+
+LOAN_COLS=("On loan","On Loan","on_loan","Loan","loan","On loan?")
+YES=("yes","y","true","1")
+
+def is_loan(p:dict)->bool:
+    for k in LOAN_COLS:
+        if k in p and str(p[k]).strip().lower() in (*YES,"on loan"):
+            return True
+    return False
+
+def is_loaned_out(p:dict)->bool:
+    return str(p.get("Loaned Out","")).strip().lower() in YES
+
+def is_youth(p:dict)->bool:
+    return str(p.get("Youth Player","")).strip().lower() in YES
+
+# Name colours: contracted, out of contract, final year, on loan, loaned out, youth
+PLAYER_COLORS=("#ffffff","#ef4444","#f59e0b","#22c55e","#eab308","#9ca3af")
+
+def player_css_color(yrs:int,loan:bool,loaned_out:bool=False,youth:bool=False)->str:
+    if loaned_out: return PLAYER_COLORS[4]   # yellow — loaned out
+    if youth:      return PLAYER_COLORS[5]   # light grey — youth player
+    if loan:       return PLAYER_COLORS[3]   # green — on loan (incoming)
+    if yrs==0:     return PLAYER_COLORS[1]   # red — out of contract
+    if yrs==1:     return PLAYER_COLORS[2]   # amber — final year
+    return PLAYER_COLORS[0]
+
+def _score_hex(v:float)->str:
+    if v<=50:
+        t=v/50; r=int(239+(234-239)*t); g=int(68+(179-68)*t); b=int(68+(8-68)*t)
+    else:
+        t=(v-50)/50; r=int(234+(34-234)*t); g=int(179+(197-179)*t); b=int(8+(94-8)*t)
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+# Red → amber → green per whole score point, so a score is coloured like the number shown
+SCORE_COLORS:tuple[str,...]=tuple(_score_hex(v) for v in range(101))
+
+def score_to_color(v:float)->str:
+    if np.isnan(v): return "#4b5563"
+    return SCORE_COLORS[int(max(0.0,min(100.0,float(v))))]
+
+# ── Display attributes ────────────────────────────────────────────────────────
+# Contract years, loan / loaned-out / youth flags and name colour as frame columns,
+# derived once at ingest from each column's distinct values; renderers read them.
+DISPLAY_COLS=("_yrs","_loan","_loaned_out","_youth","_color")
+
+def _text_flag(s:pd.Series,yes=YES)->np.ndarray:
+    """str(v).strip().lower() in yes for every row, evaluated once per distinct value."""
+    cat=s if isinstance(s.dtype,pd.CategoricalDtype) else s.astype("category")
+    hit=np.append(cat.cat.categories.astype(str).str.strip().str.lower().isin(yes),False)
+    return hit[cat.cat.codes.to_numpy()]   # code -1 (missing) picks the trailing False
+
+def _contract_years_col(s:pd.Series,year:int)->np.ndarray:
+    """contract_years for every row, evaluated once per distinct value."""
+    cat=s if isinstance(s.dtype,pd.CategoricalDtype) else s.astype("category")
+    y=pd.to_numeric(cat.cat.categories.astype(str).str.extract(r"(20\d{2})",expand=False),errors="coerce")
+    yrs=np.append(np.where(np.isnan(y),-1,np.maximum(0,np.nan_to_num(y)-year)),-1).astype(np.int16)
+    return yrs[cat.cat.codes.to_numpy()]
+
+def add_display_cols(df:pd.DataFrame)->pd.DataFrame:
+    n=len(df); no=np.zeros(n,dtype=bool)
+    yrs=(_contract_years_col(df["Contract expires"],date.today().year) if "Contract expires" in df.columns
+         else np.full(n,-1,dtype=np.int16))
+    loan=no.copy()
+    for c in LOAN_COLS:
+        if c in df.columns: loan|=_text_flag(df[c],(*YES,"on loan"))
+    out=_text_flag(df["Loaned Out"]) if "Loaned Out" in df.columns else no
+    youth=_text_flag(df["Youth Player"]) if "Youth Player" in df.columns else no
+    code=np.select([out,youth,loan,yrs==0,yrs==1],[4,5,3,1,2],0)   # player_css_color's precedence
+    df["_yrs"]=yrs; df["_loan"]=loan; df["_loaned_out"]=out; df["_youth"]=youth
+    df["_color"]=pd.Categorical.from_codes(code,PLAYER_COLORS)
+    return df
+
+def update_display_cols(df:pd.DataFrame,index)->None:
+    """Re-derive the display columns for just these rows (e.g. after a contract edit)."""
+    sub=add_display_cols(df.loc[index].copy())
+    for c in DISPLAY_COLS: df.loc[index,c]=sub[c].to_numpy()
+
+def display_attrs(p:dict)->dict:
+    """Scalar display columns for one player dict."""
+    yrs=contract_years(p.get("Contract expires","")); loan,out,youth=is_loan(p),is_loaned_out(p),is_youth(p)
+    return {"_yrs":yrs,"_loan":loan,"_loaned_out":out,"_youth":youth,"_color":player_css_color(yrs,loan,out,youth)}
+
+def player_display(p:dict)->dict:
+    """p, with the display columns filled in if it was not built from a load_dataset frame
+    (added players)."""
+    if "_color" not in p: p.update(display_attrs(p))
+    return p
+
+def name_suffix(p:dict,show_contracts:bool=True,hide_pos_override=(),multi_mark:str=" \U0001f501")->str:
+    """Text after a player's name: contract years or L(oan), OOP position, multi-role mark."""
+    d=player_display(p); yrs=d["_yrs"]
+    multi=multi_mark if pos_record(p).multi else ""
+    oop_s=f" ({p['_primary_pos']})" if (p.get('_show_pos') and p.get('_key','') not in hide_pos_override) else ''
+    if d["_loan"]:
+        return f" L{oop_s}{multi}" if show_contracts else f"{oop_s}{multi}"
+    yr_str=f"+{yrs}" if yrs>=0 else "+?"
+    return f"{(yr_str if show_contracts else '')}{oop_s}{multi}"
+
+def name_color(p:dict,white_names:bool=False)->str:
+    return "#ffffff" if white_names else player_display(p)["_color"]
+
+def stat_parts(p:dict,show_mins:bool,show_goals:bool,show_assists:bool,
+               marks:tuple=("\u2032","\u26bd","\U0001f170"))->list[str]:
+    """Minutes always (when shown); goals and assists only when non-zero."""
+    out=[]
+    if show_mins: out.append(f"{int(float(p.get('Minutes played') or 0))}{marks[0]}")
+    if show_goals:
+        g=float(p.get("Goals") or 0)
+        if g>0: out.append(f"{int(g)}{marks[1]}")
+    if show_assists:
+        a=float(p.get("Assists") or 0)
+        if a>0: out.append(f"{int(a)}{marks[2]}")
+    return out
+
+# ── Ingest ─────────────────────────────────────────────────────────────────────
+# Declared schema for the Wyscout-style export. Every numeric column is parsed and
+# zero-filled exactly once here; anything not listed is a float32 metric if its values
+# parse as numbers (role metrics always do), and is kept as text otherwise.
+CATEGORY_COLS=["League","Team","Position","Foot"]
+TEXT_COLS=["Player","Contract expires","Birth country"]
+FLAG_COLS={"Youth Player"}   # yes/no text; loan columns are matched by name in _is_flag_col
+COUNT_COLS:dict[str,str]={"Age":"int16","Matches played":"int16","Minutes played":"int32",
+                          "Goals":"int16","Assists":"int16","Height":"int16","Market value":"int64"}
+try:
+    import pyarrow  # noqa: F401 — optional, multithreaded CSV parser
+    CSV_ENGINE="pyarrow"
+except ImportError:
+    CSV_ENGINE="c"
+try:
+    from scipy.optimize import linear_sum_assignment  # optional, C assignment solver
+except ImportError:
+    linear_sum_assignment=None
+
+def _is_flag_col(c:str)->bool: return c in FLAG_COLS or c.startswith("On ") or "loan" in c.lower()
+
+def _schema_dtypes(cols)->dict:
+    out={}
+    for raw in cols:
+        c=raw.strip()
+        if c in CATEGORY_COLS:                 out[raw]="category"
+        elif c in TEXT_COLS or _is_flag_col(c): out[raw]=str
+        elif c in COUNT_COLS:                  out[raw]="float64"   # NaN-safe; cast after fill
+        else:                                  out[raw]="float32"
+    return out
+
+def load_dataset(src)->pd.DataFrame:
+    """Parse a CSV (path or raw bytes) into the typed frame the rest of the app expects."""
+    buf=(lambda: io.BytesIO(src)) if isinstance(src,(bytes,bytearray)) else (lambda: src)
+    dtypes=_schema_dtypes(pd.read_csv(buf(),nrows=0).columns)
+    try:
+        df=pd.read_csv(buf(),dtype=dtypes,engine=CSV_ENGINE)
+    except (ValueError,TypeError):
+        # A column holds text. Counts and role metrics are numbers with the odd "-"/"n/a",
+        # so coerce those; any other column is numeric only if every value parses.
+        df=pd.read_csv(buf(),dtype={k:v for k,v in dtypes.items() if v in ("category",str)})
+        for raw,t in dtypes.items():
+            if t in ("category",str): continue
+            num=pd.to_numeric(df[raw],errors="coerce")
+            if t!="float32" or raw.strip() in ROLE_METRICS or num.count()==df[raw].count():
+                df[raw]=num.astype(t)
+    df.columns=df.columns.str.strip()
+    for c in CATEGORY_COLS:
+        if c not in df.columns: continue
+        s=df[c].astype("category")
+        if s.hasnans: s=s.cat.add_categories("nan").fillna("nan")
+        cats=s.cat.categories.astype(str).str.strip()
+        df[c]=s.cat.rename_categories(cats) if cats.is_unique else s.astype(str).str.strip().astype("category")
+    if "Player" in df.columns: df["Player"]=df["Player"].astype(str).str.strip()
+    for c in df.columns:
+        if c in COUNT_COLS: df[c]=df[c].fillna(0).astype(COUNT_COLS[c])
+        elif df[c].dtype=="float32": df[c]=df[c].fillna(0.0)
+    add_position_cols(df); add_display_cols(df)
+    df["_key"]=df.index.to_numpy()   # row id: names repeat, even within a team ("E. Turns" ×2)
+    return df
+
+ROLE_SCORE_SKIP={"Player","League","Team","Position","Age","Market value","Contract expires",
+                 "Matches played","Minutes played","Goals","Assists","xG","xA",
+                 "Birth country","Foot","Height","_key",*POSITION_COLS,*DISPLAY_COLS}
+ROLE_SCORE_MIN_MINUTES=200   # pool eligibility for percentile ranking
+POOL_OF_TOK:dict[str,str]={t:rk for rk,toks in POS_POOL_MAP.items() for t in toks}
+
+def _coerce_metrics(df:pd.DataFrame)->pd.DataFrame:
+    """Zero-filled numeric metrics. Returns df itself for load_dataset() frames, which are typed at ingest."""
+    num=pd.api.types.is_numeric_dtype
+    todo=[c for c in df.columns if c not in ROLE_SCORE_SKIP and not c.startswith("_rs_") and not _is_flag_col(c)
+          and (c in ROLE_METRICS or num(df[c])) and not (num(df[c]) and not df[c].hasnans)]
+    if not todo: return df
+    df=df.copy()
+    for c in todo: df[c]=pd.to_numeric(df[c],errors="coerce").fillna(0.0)
+    return df
+
+def _score_pools(df:pd.DataFrame,rs:pd.DataFrame,groups:dict[str,set]|None=None)->None:
+    """Write role scores for df's rows into rs in place. groups limits work to {role key: leagues}."""
+    for rk,pool_pos in POS_POOL_MAP.items():
+        names,mets,W=ROLE_WEIGHTS.get(rk,([],[],np.zeros((0,0))))
+        have=[m for m in mets if m in df.columns]
+        mask=(df["_ftok"].isin(pool_pos)&(df["Minutes played"]>=ROLE_SCORE_MIN_MINUTES)).to_numpy()
+        if groups is not None:
+            if not groups.get(rk): continue
+            mask=mask&df["League"].isin(groups[rk]).to_numpy()
+        if not mask.any() or not have: continue
+        # One grouped rank per (League, pool) covers every metric of every role in the pool
+        pool=df.loc[mask,["League"]+have]
+        pct=np.full((len(pool),len(mets)),np.nan)
+        pct[:,[mets.index(m) for m in have]]=(
+            pool.groupby("League",sort=False,observed=True)[have].rank(pct=True,method="average").to_numpy(dtype=float)*100.0)
+        # Missing metrics drop out of both numerator and denominator
+        present=~np.isnan(pct)
+        num=np.where(present,pct,0.0)@W.T; den=present@W.T
+        with np.errstate(invalid="ignore",divide="ignore"):
+            sc=np.where(den>0,num/den,np.nan)
+        rs.loc[mask,[f"_rs_{rn}" for rn in names]]=sc.astype(np.float32)
+
+def _empty_scores(index)->pd.DataFrame:
+    return pd.DataFrame(np.nan,index=index,columns=ROLE_SCORE_COLS,dtype=np.float32)
+
+def compute_role_scores(df:pd.DataFrame)->pd.DataFrame:
+    """float32 ROLE_SCORE_COLS block on df's index (row id). The raw columns are not copied."""
+    rs=_empty_scores(df.index)
+    _score_pools(_coerce_metrics(df),rs)
+    return rs
+
+# Leagues are ranked independently, so league shards can be scored in separate processes.
+# Below this many rows, process start-up and pickling cost more than they save.
+PARALLEL_MIN_ROWS=50_000
+
+def compute_role_scores_parallel(df:pd.DataFrame,workers:int|None=None,
+                                 min_rows:int=PARALLEL_MIN_ROWS)->pd.DataFrame:
+    """compute_role_scores(df) with leagues sharded across a process pool; identical output."""
+    workers=workers or os.cpu_count() or 1
+    sizes=df.groupby("League",observed=True).size().sort_values(ascending=False)
+    if workers<2 or len(df)<min_rows or len(sizes)<2 or not df.index.is_unique:
+        return compute_role_scores(df)
+    # Largest leagues first onto the least-loaded shard keeps shard sizes even
+    shards:list[list]=[[] for _ in range(min(workers,len(sizes)))]; load=[0]*len(shards)
+    for lg,n in sizes.items():
+        i=load.index(min(load)); shards[i].append(lg); load[i]+=n
+    # Ship only what scoring reads
+    mets=dict.fromkeys(m for _,ms,_ in ROLE_WEIGHTS.values() for m in ms if m in df.columns)
+    cols=["League","_ftok","Minutes played",*mets]
+    parts=[df.loc[df["League"].isin(lgs),cols] for lgs in shards]
+    with ProcessPoolExecutor(max_workers=len(parts)) as ex:
+        out=pd.concat(list(ex.map(compute_role_scores,parts)))
+    return out.reindex(df.index)
+
+def _conform_rows(rows:pd.DataFrame,df:pd.DataFrame)->tuple[pd.DataFrame,pd.DataFrame]:
+    """rows reshaped to df's columns and dtypes; df's categoricals widened to admit rows' new values."""
+    rows=add_display_cols(add_position_cols(rows.copy()))   # Position/contract may have been edited; re-derive
+    rows["_key"]=rows.index.to_numpy()
+    rows=_coerce_metrics(rows.reindex(columns=df.columns))
+    for c,t in df.dtypes.items():
+        if isinstance(t,pd.CategoricalDtype):
+            extra=pd.Index(rows[c].dropna().astype(str).unique()).difference(t.categories)
+            if len(extra): df[c]=df[c].cat.add_categories(extra)
+            rows[c]=rows[c].astype(df[c].dtype)
+        elif t!=rows[c].dtype:
+            if c in COUNT_COLS: rows[c]=rows[c].fillna(0)
+            try: rows[c]=rows[c].astype(t)
+            except (TypeError,ValueError): pass
+    return rows,df
+
+def rescore_delta(df:pd.DataFrame,rs:pd.DataFrame,upserts:pd.DataFrame|None=None,
+                  removed=())->tuple[pd.DataFrame,pd.DataFrame]:
+    """Patch (dataset, score block) with a row delta instead of rescoring every league.
+    upserts: full raw rows keyed by index label (existing labels are updated, new ones inserted).
+    removed: index labels to drop. Only the (League, pool) groups those rows leave or join are re-ranked."""
+    upserts=upserts if upserts is not None else df.iloc[:0]
+    removed=[i for i in removed if i in df.index]
+    groups:dict[str,set]={}
+    def touch(rows:pd.DataFrame):
+        for tok,lg in zip(rows["_ftok"],rows["League"]):
+            if tok in POOL_OF_TOK: groups.setdefault(POOL_OF_TOK[tok],set()).add(lg)
+    touch(df.loc[df.index.intersection(upserts.index.append(pd.Index(removed)))])
+    df=df.drop(index=removed); rs=rs.drop(index=removed)
+    if len(upserts):
+        up,df=_conform_rows(upserts,df)
+        touch(up)
+        upd=up.index.intersection(df.index)
+        if len(upd): df.loc[upd]=up.loc[upd]; rs.loc[upd]=np.nan
+        new=up.loc[~up.index.isin(df.index)]
+        if len(new): df=pd.concat([df,new]); rs=pd.concat([rs,_empty_scores(new.index)])
+    _score_pools(df,rs,groups)
+    return df,rs
+
+# ── Persistent score cache ────────────────────────────────────────────────────
+# float32 score blocks saved as .npz, keyed by source CSV content hash + role config hash,
+# so restarts and redeploys skip scoring. Entries for an old role config are purged.
+SCORE_CACHE_DIR=os.environ.get("DEPTH_CHART_CACHE_DIR",".score_cache")
+SCORE_CACHE_MAX_BYTES=256*1024*1024
+SCORE_WORKERS=int(os.environ.get("DEPTH_CHART_SCORE_WORKERS","1"))   # >1 opts into league-sharded scoring
+# Bump when the stored scores change without the role config changing (dtype, CSV parsing,
+# ranking), so entries written by older code are never served. 2: float32 scores, typed ingest.
+SCORE_CACHE_VERSION=2
+
+def role_config_hash()->str:
+    cfg={"version":SCORE_CACHE_VERSION,"buckets":ROLE_BUCKETS,"pools":POS_POOL_MAP,"min_minutes":ROLE_SCORE_MIN_MINUTES}
+    return hashlib.sha256(json.dumps(cfg,sort_keys=True).encode()).hexdigest()[:16]
+
+def _score_cache_path(src_hash:str)->str:
+    return os.path.join(SCORE_CACHE_DIR,f"{src_hash[:32]}-{role_config_hash()}.npz")
+
+def score_cache_get(src_hash:str,n_rows:int)->np.ndarray|None:
+    path=_score_cache_path(src_hash)
+    try:
+        with np.load(path,allow_pickle=False) as z:
+            if list(z["cols"])!=ROLE_SCORE_COLS or z["rs"].shape[0]!=n_rows: return None
+            rs=z["rs"]
+        os.utime(path)   # mtime doubles as last-used for eviction
+    except (OSError,KeyError,ValueError):
+        return None
+    return rs
+
+def score_cache_put(src_hash:str,rs:np.ndarray)->None:
+    try:
+        os.makedirs(SCORE_CACHE_DIR,exist_ok=True)
+        fd,tmp=tempfile.mkstemp(dir=SCORE_CACHE_DIR,suffix=".tmp")
+        try:
+            with os.fdopen(fd,"wb") as f: np.savez(f,rs=rs,cols=np.array(ROLE_SCORE_COLS))
+            os.replace(tmp,_score_cache_path(src_hash))   # atomic: readers never see a partial file
+        finally:
+            if os.path.exists(tmp): os.remove(tmp)
+        _evict_score_cache()
+    except OSError:
+        pass   # read-only or full disk — the cache is an optimisation only
+
+def _evict_score_cache()->None:
+    cfg=role_config_hash(); entries=[]
+    for name in os.listdir(SCORE_CACHE_DIR):
+        path=os.path.join(SCORE_CACHE_DIR,name)
+        if not name.endswith(".npz"): continue
+        if not name.endswith(f"-{cfg}.npz"): os.remove(path); continue
+        s=os.stat(path); entries.append((s.st_mtime,s.st_size,path))
+    total=sum(e[1] for e in entries)
+    for _,size,path in sorted(entries):
+        if total<=SCORE_CACHE_MAX_BYTES: break
+        os.remove(path); total-=size
+
+def scores_from_cache(df:pd.DataFrame,src_hash:str)->pd.DataFrame:
+    """compute_role_scores(df), served from the disk cache when this exact CSV was scored before."""
+    rs=score_cache_get(src_hash,len(df))
+    if rs is None:
+        out=compute_role_scores_parallel(df,SCORE_WORKERS)
+        score_cache_put(src_hash,out.to_numpy())
+        return out
+    return pd.DataFrame(rs.astype(np.float32,copy=False),index=df.index,columns=ROLE_SCORE_COLS)
+
+def memory_report(df:pd.DataFrame,rs:pd.DataFrame)->dict[str,int]:
+    """Bytes held for one loaded dataset: raw columns, score block, total and per player."""
+    out={"raw":int(df.memory_usage(deep=True).sum()),"scores":int(rs.memory_usage(deep=True).sum())}
+    out["total"]=out["raw"]+out["scores"]
+    out["per_player"]=out["total"]//max(len(df),1)
+    return out
+
+def build_percentile_index(df:pd.DataFrame)->dict[tuple,dict[str,np.ndarray]]:
+    """(League, role key) → {metric: sorted pool values}, over the same pools compute_role_scores ranks.
+    A (None, role key) entry spans every league for players whose league is not in the dataset."""
+    idx={}
+    for rk,pool_pos in POS_POOL_MAP.items():
+        have=[m for m in ROLE_WEIGHTS[rk][1] if m in df.columns]
+        pool=df[df["_ftok"].isin(pool_pos)&(df["Minutes played"]>=ROLE_SCORE_MIN_MINUTES)]
+        if pool.empty or not have: continue
+        for lg,grp in [(None,pool)]+list(pool.groupby("League",sort=False,observed=True)):
+            vals=grp[have].to_numpy(dtype=float)
+            idx[(lg,rk)]={m:np.sort(v[~np.isnan(v)]) for m,v in zip(have,vals.T)}
+    return idx
+
+def build_player_index(df:pd.DataFrame,rs:pd.DataFrame)->tuple[dict[int,int],np.ndarray]:
+    """(_key → row, float32 ROLE_SCORE_COLS matrix). _key is the row id, so same-named players,
+    even at one club, each read their own scores; added players (custom_<name>) miss."""
+    pos={k:i for i,k in enumerate(df["_key"].tolist())}
+    return pos,rs.reindex(index=df.index).to_numpy(dtype=np.float32)
+
+def score_stat_line(pct_index:dict,league,position:str,stats:dict)->dict[str,float]:
+    """Role scores for a stat line that is not part of the ranked pool (new signing, trialist, what-if).
+    Each metric's percentile is where the value would rank if inserted into the pool (binary search)."""
+    rk=_role_key(position)
+    sorted_by_met=pct_index.get((league,rk)) or pct_index.get((None,rk))
+    if not sorted_by_met: return {}
+    names,mets,W=ROLE_WEIGHTS[rk]
+    pct=np.full(len(mets),np.nan)
+    for j,m in enumerate(mets):
+        a=sorted_by_met.get(m)
+        try: v=float(stats.get(m))
+        except (TypeError,ValueError): continue
+        if a is None or not len(a) or np.isnan(v): continue
+        lo=np.searchsorted(a,v,"left"); hi=np.searchsorted(a,v,"right")
+        pct[j]=(lo+hi+2)/2/(len(a)+1)*100.0   # average rank among ties, pool size n+1
+    present=~np.isnan(pct)
+    den=W@present
+    num=W@np.where(present,pct,0.0)
+    return {rn:float(num[i]/den[i]) for i,rn in enumerate(names) if den[i]>0}
+
+def stat_line(row)->dict:
+    """The metric fields of a dataset row — what score_stat_line reads — to seed a player added by hand."""
+    return {c:v for c,v in row.items() if c in ROLE_METRICS}
+
+# Fallback canonical: maps raw token → ordered list of slot labels to try when player unassigned
+FALLBACK_CANON:dict[str,list]={
+    "DMF":["DM","CM"],"LDMF":["DM","CM"],"RDMF":["DM","CM"],
+    "LCMF":["CM","DM"],"RCMF":["CM","DM"],
+    "AMF":["AM","CM","LW","RW"],"LAMF":["LW","AM","RW"],"RAMF":["RW","AM","LW"],
+    "LW":["LW","AM"],"RW":["RW","AM"],"LWF":["LW","AM"],"RWF":["RW","AM"],
+    "CF":["ST"],"GK":["GK"],
+    "CB":["CB","LCB","RCB"],"LCB":["LCB","CB"],"RCB":["RCB","CB"],
+    "LB":["LB","LWB"],"RB":["RB","RWB"],"LWB":["LWB","LB"],"RWB":["RWB","RB"],
+}
+def assign_players(players:list,formation_key:str,mode:str="greedy",
+                   player_index=None)->tuple[dict,list]:
+    """Fill the formation's slots: slot id → [starter, depth…], plus unplaced depth.
+    mode "greedy" walks PITCH_ORDER; "optimal" solves the XI as a min-cost matching."""
+    if mode=="optimal": return assign_players_optimal(players,formation_key,player_index)
+    ft=FORMATION_TABLES.get(formation_key,FORMATION_TABLES["4-2-3-1"])
+    slots=ft.slots
+    assigned:set=set()
+    slot_map:dict[str,list]={s["id"]:[] for s in slots}
+
+    # Per-player facts read once: first token, primary/secondary slot masks, side, minutes
+    tok_of:dict[int,str]={}; first_of:dict[int,int]={}; second_of:dict[int,int]={}
+    side_of:dict[int,str]={}; mins_of:dict[int,float]={}
+    for p in players:
+        rec=pos_record(p); k=id(p)
+        tok_of[k]=rec.tok; first_of[k]=ft.first_fits(rec.tok)
+        sm=0
+        for t in rec.toks[1:]: sm|=ft.second_fits(t)
+        second_of[k]=sm; side_of[k]=rec.side
+        mins_of[k]=float(p.get("Minutes played") or 0)
+    by_mins=lambda p:-mins_of[id(p)]
+
+    def side_score(p,ss):
+        ps=side_of[id(p)]
+        if ss=="N" or ps=="N": return 1
+        return 0 if ps==ss else 2
+
+    for label in PITCH_ORDER:
+        if label not in ft.by_label: continue
+        slot_list=ft.by_label[label]; lmask=ft.label_mask[label]
+
+        # Pass 1: players whose FIRST token fits this slot
+        matched=[p for p in players if p["_key"] not in assigned and first_of[id(p)]&lmask]
+
+        # Pass 2: only if no primary matches — take players who have no primary slot
+        # anywhere in the formation AND whose secondary tokens fit here
+        if not matched:
+            matched=[p for p in players if p["_key"] not in assigned
+                     and pos_record(p).canon not in ft.by_label
+                     and second_of[id(p)]&lmask]
+
+        matched.sort(key=by_mins)
+
+        # priority_toks: within first-token matches only, boost specific tokens to front
+        # (e.g. AMF before LAMF/RAMF for AM slot) — never pulls in outsiders
+        pt=ft.priority_toks[label]
+        if pt:
+            matched.sort(key=lambda p:(0 if tok_of[id(p)] in pt else 1,-mins_of[id(p)]))
+
+        for p in matched: assigned.add(p["_key"])
+        n=len(slot_list)
+        if n==1:
+            slot_map[slot_list[0]["id"]]=matched
+        else:
+            ordered=ft.by_side[label]
+            for sl in slot_list: slot_map[sl["id"]]=[]
+            starters=[]; used=set()
+            # Pick best-fit starter for each slot
+            for sl in ordered:
+                best=None; best_sc=99
+                for p in matched:
+                    if id(p) in used: continue
+                    sc=side_score(p,sl["side"])
+                    if sc<best_sc: best_sc=sc; best=p
+                if best: starters.append((sl["id"],best)); used.add(id(best))
+            for sid,p in starters: slot_map[sid].append(p)
+            # Distribute remaining players round-robin across slots by minutes order
+            depth_rem=[p for p in matched if id(p) not in used]
+            for i,p in enumerate(depth_rem):
+                slot_map[ordered[i % n]["id"]].append(p)
+
+    def split_cbs(ids):
+        """Players in these slots by minutes, split into (CB, LCB, RCB, other) by first token."""
+        pool=sorted((p for sid in ids for p in slot_map.get(sid,[])),key=by_mins)
+        by={"CB":[],"LCB":[],"RCB":[],None:[]}
+        for p in pool: by[tok_of[id(p)] if tok_of[id(p)] in by else None].append(p)
+        return pool,by["CB"],by["LCB"],by["RCB"],by[None]
+
+    # ── Fix 4: 4-back CB redistribution by position token ────────────────────
+    if formation_key in FOUR_BACK_FORMATIONS and "CB1" in ft.by_id and "CB2" in ft.by_id:
+        _,cb_p,lcb_p,rcb_p,oth_p=split_cbs(("CB1","CB2"))
+        # Left slot = CB1, Right slot = CB2
+        left=[]; right=[]
+        # Assign specific sided players first
+        left.extend(lcb_p); right.extend(rcb_p)
+        # Distribute pure CB alternately starting with left (most mins first)
+        for i,p in enumerate(cb_p):
+            (left if i%2==0 else right).append(p)
+        # Any others (OOP) fill by minutes alternately
+        for i,p in enumerate(oth_p):
+            (left if i%2==0 else right).append(p)
+        slot_map["CB1"]=left
+        slot_map["CB2"]=right
+    # ── End Fix 4 ────────────────────────────────────────────────────────────
+    # ── Fix 6: 3-back CB redistribution ──────────────────────────────────────
+    # For 3-back formations, re-distribute CB/LCB/RCB players correctly:
+    # Pure CB → middle; LCB → left; RCB → right.
+    # If no pure CB, alternate by minutes: 1st→CB, 2nd→RCB, 3rd→CB, 4th→RCB...
+    if formation_key in THREE_BACK_FORMATIONS and all(i in ft.by_id for i in ("LCB","CB","RCB")):
+        all_cbs,pure_cb,pure_lcb,pure_rcb,other=split_cbs(("LCB","CB","RCB"))
+        # Fill slots:
+        # LCB slot: LCB players first, then overflow from other
+        # CB slot:  pure CB players first
+        # RCB slot: RCB players first
+        # If pure_cb empty, distribute non-LCB/RCB players alternately CB→RCB
+        cb_starters=[]; rcb_starters=[]; lcb_starters=list(pure_lcb)
+        if pure_cb:
+            cb_starters=pure_cb
+            rcb_starters=pure_rcb
+            # Any remaining RCB go to LCB depth if not enough LCB players
+            if not lcb_starters: lcb_starters=other
+        else:
+            # No pure CB — interleave remaining (sorted by mins) between CB and RCB
+            lcb_ids={id(p) for p in pure_lcb}
+            remaining=[p for p in all_cbs if id(p) not in lcb_ids]
+            for i,p in enumerate(remaining):
+                if i%2==0: cb_starters.append(p)
+                else:      rcb_starters.append(p)
+        # Assign
+        slot_map["LCB"]=lcb_starters if lcb_starters else other
+        slot_map["CB"] =cb_starters
+        slot_map["RCB"]=rcb_starters
+    # ── 5-3-2 CB redistribution (4 CB slots) ────────────────────────────────
+    if formation_key=="5-3-2" and all(i in ft.by_id for i in ("LCB","CB1","CB2","RCB")):
+        _,pure_cb,pure_lcb,pure_rcb,oth5=split_cbs(("LCB","CB1","CB2","RCB"))
+        slot_map["LCB"]=pure_lcb
+        slot_map["RCB"]=pure_rcb
+        # Distribute pure CB evenly between inner slots L/R, alternating by mins
+        inner=pure_cb+oth5
+        slot_map["CB1"]=inner[0::2]
+        slot_map["CB2"]=inner[1::2]
+    # ── End 5-3-2 CB ─────────────────────────────────────────────────────────
+    # ── End Fix 6 ────────────────────────────────────────────────────────────
+
+    # ── Fallback pass: cascade remaining players into best-fit slot ─────────
+    # Players who couldn't fit their primary slot get assigned to nearest slot
+    # that exists in the formation, marked as OOP. No one goes to depth unless
+    # there is genuinely no slot that can accommodate them.
+    remaining_after_main=sorted((p for p in players if p["_key"] not in assigned),key=by_mins)
+    for p in remaining_after_main:
+        tok=tok_of[id(p)]
+        cand=next((ft.label_ids[l] for l in FALLBACK_CANON.get(tok,[tok]) if l in ft.label_ids),None)
+        # Pick the least populated slot for that label, else any slot as absolute last resort
+        best_sid=min(cand or ft.index,key=lambda sid:len(slot_map.get(sid,[])))
+        slot_map.setdefault(best_sid,[]).append(p)
+        assigned.add(p["_key"])
+    # ── End fallback pass ────────────────────────────────────────────────────
+
+    _flag_slots(ft,slot_map)   # ALL players, including fallback-placed
+    depth=sorted((p for p in players if p["_key"] not in assigned),key=by_mins)
+    return slot_map,depth
+
+def _flag_slots(ft:FormationTable,slot_map:dict[str,list])->None:
+    """Set _oop, _primary_pos and _show_pos on every placed player."""
+    for sid,ps in slot_map.items():
+        bit=1<<ft.index[sid]; native=ft.native_toks[sid]
+        for p in ps:
+            tok=pos_record(p).tok
+            p["_oop"]=not ft.first_fits(tok)&bit
+            p["_primary_pos"]=tok
+            # _show_pos: also show position when tok is not native to this slot
+            p["_show_pos"]=(p["_oop"] or (native is not None and tok not in native))
+
+# ── Optimal assignment ────────────────────────────────────────────────────────
+# Player × slot cost; the XI is the min-cost matching. Fit tiers dominate, then
+# side, then minutes share and best role score for the slot's role bucket.
+ASSIGN_COST:dict[str,float]={"first":0.0,"secondary":10.0,"fallback":20.0,"fallback_step":2.0,
+                             "oop":40.0,"side":1.0,"minutes":3.0,"role":2.0}
+ASSIGN_MODES=("greedy","optimal")
+ROLE_OF_LABEL:dict[str,str]={CANONICAL[t]:rk for t,rk in reversed(ROLE_KEY_MAP.items())}
+
+def _min_cost_assignment(cost:np.ndarray)->tuple[np.ndarray,np.ndarray]:
+    """Hungarian algorithm (shortest augmenting path with potentials) for a rows ≤ cols
+    matrix, vectorized over columns. Returns (row indices, column indices) like scipy."""
+    if linear_sum_assignment is not None: return linear_sum_assignment(cost)
+    n,m=cost.shape
+    if n>m:
+        c,r=_min_cost_assignment(cost.T); o=np.argsort(r); return r[o],c[o]
+    u=np.zeros(n+1); v=np.zeros(m+1); p=np.zeros(m+1,dtype=int); way=np.zeros(m+1,dtype=int)
+    for i in range(1,n+1):
+        p[0]=i; j0=0; minv=np.full(m+1,np.inf); used=np.zeros(m+1,dtype=bool)
+        while p[j0]:
+            used[j0]=True; i0=p[j0]
+            cur=cost[i0-1]-u[i0]-v[1:]
+            upd=~used[1:]&(cur<minv[1:])
+            minv[1:][upd]=cur[upd]; way[1:][upd]=j0
+            free=np.where(used[1:],np.inf,minv[1:]); j1=int(np.argmin(free))+1; delta=free[j1-1]
+            u[p[used]]+=delta; v[used]-=delta; minv[~used]-=delta
+            j0=j1
+        while j0:
+            j1=way[j0]; p[j0]=p[j1]; j0=j1
+    cols=np.flatnonzero(p[1:])
+    rows=p[1:][cols]-1; o=np.argsort(rows)
+    return rows[o],cols[o]
+
+def assignment_costs(players:list,ft:FormationTable,player_index=None)->np.ndarray:
+    """players × slots cost matrix (see ASSIGN_COST)."""
+    C=ASSIGN_COST; slots=ft.slots; n=len(players)
+    cost=np.full((n,len(slots)),C["oop"])
+    mins=np.array([float(p.get("Minutes played") or 0) for p in players])
+    share=mins/mins.max() if n and mins.max()>0 else np.zeros(n)
+    pos,mat=player_index if player_index else ({},None)
+    for i,p in enumerate(players):
+        rec=pos_record(p); first=ft.first_fits(rec.tok); second=0
+        for t in rec.toks[1:]: second|=ft.second_fits(t)
+        fb=FALLBACK_CANON.get(rec.tok,[rec.tok])
+        r=pos.get(p.get("_key")) if mat is not None else None
+        for j,s in enumerate(slots):
+            bit=1<<j; lab=s["label"]
+            if first&bit:    c=C["first"]
+            elif second&bit: c=C["secondary"]
+            elif lab in fb:  c=C["fallback"]+C["fallback_step"]*fb.index(lab)
+            else:            continue
+            ps=rec.side
+            c+=C["side"]*(1 if s["side"]=="N" or ps=="N" else 0 if ps==s["side"] else 2)
+            c-=C["minutes"]*share[i]
+            if r is not None:
+                vals=[mat[r,ROLE_COL_POS[rn]] for rn in ROLE_BUCKETS.get(ROLE_OF_LABEL.get(lab,""),{})]
+                vals=[x for x in vals if not np.isnan(x)]
+                if vals: c-=C["role"]*max(vals)/100.0
+            cost[i,j]=c
+    return cost
+
+def assign_players_optimal(players:list,formation_key:str,player_index=None)->tuple[dict,list]:
+    """XI by min-cost matching over assignment_costs; the rest join their cheapest
+    slot's depth by minutes, or the depth list when no slot fits at all."""
+    ft=FORMATION_TABLES.get(formation_key,FORMATION_TABLES["4-2-3-1"])
+    slot_map:dict[str,list]={s["id"]:[] for s in ft.slots}
+    if not players: return slot_map,[]
+    cost=assignment_costs(players,ft,player_index)
+    rows,cols=_min_cost_assignment(cost)
+    starters=set(rows.tolist())
+    for i,j in zip(rows,cols): slot_map[ft.slots[j]["id"]].append(players[i])
+    mins=[float(p.get("Minutes played") or 0) for p in players]
+    depth=[]
+    for i in sorted(set(range(len(players)))-starters,key=lambda i:-mins[i]):
+        row=cost[i]
+        if row.min()>=ASSIGN_COST["oop"]: depth.append(players[i]); continue
+        j=min(np.flatnonzero(row==row.min()),key=lambda j:len(slot_map[ft.slots[j]["id"]]))
+        slot_map[ft.slots[j]["id"]].append(players[i])
+    _flag_slots(ft,slot_map)
+    return slot_map,depth
+
+# ── Team index ────────────────────────────────────────────────────────────────
+class TeamIndex(NamedTuple):
+    leagues:list[str]                        # sorted
+    teams:dict[str,list[str]]                # league → sorted teams; "All" → every team
+    rows:dict[tuple[str,str],np.ndarray]     # (league, team) → row positions, most minutes first
+    mins:dict[tuple[str,str],np.ndarray]     # (league, team) → minutes, descending
+    leagues_of:dict[str,list[str]]           # team → leagues it appears in
+    max_minutes:int
+
+def build_team_index(df:pd.DataFrame)->TeamIndex:
+    """League → teams and (league, team) → minutes-sorted row positions, built with one
+    sort so the sidebar never scans the frame. Positions are for df.iloc."""
+    lg=df["League"].astype(str).to_numpy(); tm=df["Team"].astype(str).to_numpy()
+    mins=df["Minutes played"].to_numpy() if "Minutes played" in df.columns else np.zeros(len(df))
+    order=np.lexsort((-mins,tm,lg))
+    lg_s,tm_s=lg[order],tm[order]
+    cut=np.flatnonzero((lg_s[1:]!=lg_s[:-1])|(tm_s[1:]!=tm_s[:-1]))+1
+    rows:dict={}; mn:dict={}; teams:dict[str,list]={}; leagues_of:dict[str,list]={}
+    for a,b in zip(np.r_[0,cut],np.r_[cut,len(order)]):
+        if a==b: continue
+        k=(lg_s[a],tm_s[a]); rows[k]=order[a:b]; mn[k]=mins[order[a:b]]
+        teams.setdefault(k[0],[]).append(k[1]); leagues_of.setdefault(k[1],[]).append(k[0])
+    teams["All"]=sorted(leagues_of)
+    return TeamIndex(sorted(set(lg)),teams,rows,mn,leagues_of,
+                     int(mins.max()) if len(mins) else 0)
+
+def team_rows(ti:TeamIndex,team:str,league:str="All",min_minutes:float=0)->np.ndarray:
+    """Row positions for one team (all its leagues when league is "All"), most minutes first."""
+    lgs=ti.leagues_of.get(team,[]) if league=="All" else [league]
+    parts=[]; part_mins=[]
+    for lg in lgs:
+        r=ti.rows.get((lg,team))
+        if r is None: continue
+        n=int(np.searchsorted(-ti.mins[(lg,team)],-min_minutes,side="right"))   # minutes ≥ min_minutes
+        parts.append(r[:n]); part_mins.append(ti.mins[(lg,team)][:n])
+    if len(parts)==1: return parts[0]
+    if not parts: return np.empty(0,dtype=np.intp)
+    r=np.concatenate(parts); return r[np.argsort(-np.concatenate(part_mins),kind="stable")]
+
+def league_teams(ti:TeamIndex,league:str="All",min_minutes:float=0)->list[str]:
+    """Sorted teams in a league with at least one player on min_minutes or more."""
+    if not min_minutes: return ti.teams.get(league,[])
+    return [t for t in ti.teams.get(league,[]) if len(team_rows(ti,t,league,min_minutes))]
+
+def team_league(ti:TeamIndex,team:str)->str:
+    lgs=ti.leagues_of.get(team); return lgs[0] if lgs else ""
+
+# ── Batch depth charts ────────────────────────────────────────────────────────
+def team_records(df:pd.DataFrame)->dict[str,list[dict]]:
+    """Team → player dicts, built with one pass over df. Metric columns are left out —
+    assignment and rendering only read identity, position, minutes and contract fields."""
+    cols=[c for c in df.columns if c in ROLE_SCORE_SKIP or _is_flag_col(c)]
+    by_team:dict[str,list[dict]]={}
+    for r in df[cols].to_dict("records"): by_team.setdefault(r["Team"],[]).append(r)
+    return by_team
+
+def batch_depth_charts(df:pd.DataFrame,formations=None,league:str|None=None,
+                       min_minutes:float=0)->dict[str,dict[str,dict]]:
+    """Depth charts for every club × formation: team → formation → {"slot_map","depth"}.
+    league/min_minutes mirror the sidebar filters."""
+    if league is not None: df=df[df["League"]==league]
+    if min_minutes: df=df[df["Minutes played"]>=min_minutes]
+    out:dict[str,dict[str,dict]]={}
+    for team,players in team_records(df).items():
+        out[team]={}
+        for fk in formations or FORMATIONS:
+            # assign_players flags players in place, so each formation gets its own dicts
+            sm,dep=assign_players([dict(p) for p in players],fk)
+            out[team][fk]={"slot_map":sm,"depth":dep}
+    return out
+
+# ── Formation recommender ────────────────────────────────────────────────────
+def _best_by_role(players:list,player_index)->list[dict[str,float]]:
+    """Per player, role key → best role score; read from the score matrix once for all formations."""
+    if not player_index: return [{} for _ in players]
+    pos,mat=player_index
+    rows=[pos.get(p.get("_key")) for p in players]
+    out=[]
+    for r in rows:
+        if r is None: out.append({}); continue
+        d={}
+        for rk,roles in ROLE_BUCKETS.items():
+            v=mat[r,[ROLE_COL_POS[rn] for rn in roles]]
+            if not np.isnan(v).all(): d[rk]=float(np.nanmax(v))
+        out.append(d)
+    return out
+
+def recommend_formations(players:list,player_index=None,mode:str="greedy",
+                         formations=None,workers:int=1)->list[dict]:
+    """Score one squad against every formation and rank them: fewest empty slots, then
+    fewest OOP starters, then highest mean starter role score (5-3-2 fields twelve, so
+    sums are not comparable). Positions are parsed and role scores read once for all
+    formations; workers>1 evaluates formations on threads."""
+    best=_best_by_role(players,player_index)
+    best_of={p["_key"]:b for p,b in zip(players,best)}
+    def evaluate(fk:str)->dict:
+        ft=FORMATION_TABLES[fk]
+        sm,_=assign_players([dict(p) for p in players],fk,mode,player_index)
+        score=0.0; oop=0; filled=0
+        for sid,ps in sm.items():
+            if not ps: continue
+            s=ps[0]; filled+=1; oop+=bool(s["_oop"])
+            score+=best_of.get(s["_key"],{}).get(ROLE_OF_LABEL.get(ft.by_id[sid]["label"],""),0.0)
+        return {"formation":fk,"score":round(score,1),"avg":round(score/max(filled,1),1),
+                "oop":oop,"filled":filled,"slots":len(ft.slots)}
+    fks=list(formations or FORMATIONS)
+    if workers>1:
+        with ThreadPoolExecutor(max_workers=workers) as ex: res=list(ex.map(evaluate,fks))
+    else:
+        res=[evaluate(fk) for fk in fks]
+    return sorted(res,key=lambda r:(r["slots"]-r["filled"],r["oop"],-r["avg"]))
+
+# ── Squad editor ──────────────────────────────────────────────────────────────
+DEPTH_SLOT="_depth"
+
+class SquadEditor:
+    """A squad as a keyed player table plus an operation log.
+    Ops are tuples: ("move",key,slot,index|None) ("remove",key) ("reorder",key,step)
+    ("contract",key,expires) ("add",player,slot). Slots hold _keys (the dataset row id, or
+    custom_<name> for added players), so every op is an O(1) lookup plus a short slot-list splice. Each applied op records its inverse for undo;
+    a new op after an undo drops the undone tail, as in any editor."""
+    def __init__(self,slot_map:dict[str,list],depth:list,team:str="",formation:str=""):
+        self.team=team; self.formation=formation
+        self.players:dict[int|str,dict]={}; self.slot_of:dict[int|str,str|None]={}
+        self.slots:dict[str,list[int|str]]={sid:[] for sid in slot_map}; self.slots[DEPTH_SLOT]=[]
+        for sid,ps in [*slot_map.items(),(DEPTH_SLOT,depth)]:
+            for p in ps:
+                self.players[p["_key"]]=p; self.slot_of[p["_key"]]=sid; self.slots[sid].append(p["_key"])
+        self.base={sid:list(ks) for sid,ks in self.slots.items()}
+        self.log:list[tuple]=[]; self._inverse:list[tuple]=[]; self.head=0
+
+    # views
+    def slot_map(self)->dict[str,list]:
+        return {sid:[self.players[k] for k in ks] for sid,ks in self.slots.items() if sid!=DEPTH_SLOT}
+    def depth(self)->list: return [self.players[k] for k in self.slots[DEPTH_SLOT]]
+    def get(self,key:int|str)->dict|None: return self.players.get(key)
+    def can_undo(self)->bool: return self.head>0
+    def can_redo(self)->bool: return self.head<len(self.log)
+
+    # log
+    # apply/undo/redo return the op actually applied (None if nothing to do), so callers
+    # can mirror it onto state outside the editor, e.g. a contract edit onto the dataset
+    def apply(self,op:tuple)->tuple:
+        del self.log[self.head:],self._inverse[self.head:]
+        self._inverse.append(self._do(op)); self.log.append(op); self.head+=1; return op
+    def undo(self)->tuple|None:
+        if not self.can_undo(): return None
+        self.head-=1; op=self._inverse[self.head]; self._do(op); return op
+    def redo(self)->tuple|None:
+        if not self.can_redo(): return None
+        op=self.log[self.head]; self._inverse[self.head]=self._do(op); self.head+=1; return op
+
+    def _take(self,key:int|str)->tuple[str|None,int|None]:
+        sid=self.slot_of.get(key)
+        if sid is None: return None,None
+        i=self.slots[sid].index(key); del self.slots[sid][i]; self.slot_of[key]=None
+        return sid,i
+    def _put(self,key:int|str,sid:str,i:int|None)->None:
+        ks=self.slots.setdefault(sid,[])
+        ks.insert(len(ks) if i is None else i,key); self.slot_of[key]=sid
+
+    def _do(self,op:tuple)->tuple:
+        """Apply one op, return its inverse."""
+        kind=op[0]
+        if kind=="move":
+            _,key,sid,i=op; frm,at=self._take(key); self._put(key,sid,i)
+            return ("move",key,frm,at) if frm is not None else ("remove",key)
+        if kind=="remove":
+            frm,at=self._take(op[1])
+            return ("move",op[1],frm,at) if frm is not None else ("reorder",op[1],0)
+        if kind=="reorder":
+            _,key,step=op; ks=self.slots.get(self.slot_of.get(key),[])
+            i=ks.index(key) if key in ks else -1; j=i+step
+            if i<0 or not 0<=j<len(ks) or not step: return ("reorder",key,0)
+            ks[i],ks[j]=ks[j],ks[i]; return ("reorder",key,-step)
+        if kind=="contract":
+            _,key,val=op; p=self.players[key]; old=p.get("Contract expires","")
+            p["Contract expires"]=val; p.update(display_attrs(p)); return ("contract",key,old)
+        if kind=="add":
+            _,p,sid=op; self.players[p["_key"]]=p; self._put(p["_key"],sid,None)
+            return ("remove",p["_key"])
+        raise ValueError(f"unknown squad op {kind!r}")
+
+    # serialization
+    def dumps(self)->str:
+        """Compact JSON: the starting slot keys and the applied ops. Dataset players are
+        stored by key only; added players carry their full row."""
+        return json.dumps({"v":1,"team":self.team,"formation":self.formation,
+                           "base":self.base,"log":self.log[:self.head]},separators=(",",":"),default=str)
+
+    @classmethod
+    def loads(cls,s:str,players)->"SquadEditor":
+        """Rebuild from dumps() output; players supplies the dataset rows by _key
+        (e.g. a fresh assign_players result for the same team and formation)."""
+        d=json.loads(s); by_key={p["_key"]:p for p in players}
+        sm={sid:[by_key[k] for k in ks if k in by_key] for sid,ks in d["base"].items() if sid!=DEPTH_SLOT}
+        ed=cls(sm,[by_key[k] for k in d["base"].get(DEPTH_SLOT,[]) if k in by_key],d.get("team",""),d.get("formation",""))
+        for op in d["log"]:
+            op=tuple(op)
+            if op[0]!="add" and op[1] not in ed.players: continue   # row gone from the dataset
+            ed.apply(op)
+        return ed
+
+# ── Score HTML ─────────────────────────────────────────────────────────────────
+def _player_role_scores(player,player_index,pct_index=None)->dict[str,float]:
+    """Scores from the player index; players not in the dataset are scored off the percentile index."""
+    if not player_index: return {}
+    pos,mat=player_index
+    i=pos.get(player.get("_key"))
+    if i is None:
+        return score_stat_line(pct_index,player.get("League"),player.get("Position",""),player) if pct_index else {}
+    rk=pos_record(player).role; scores={}
+    for rn in ROLE_BUCKETS.get(rk,{}):
+        v=mat[i,ROLE_COL_POS[rn]]
+        if not np.isnan(v): scores[rn]=float(v)
+    return scores
+
+def all_roles_html(player,player_index,flip=False,pct_index=None):
+    scores=_player_role_scores(player,player_index,pct_index)
+    if not scores: return ""
+    best=max(scores,key=scores.get); lines=[]
+    for rn,sc in sorted(scores.items(),key=lambda x:-x[1]):
+        sc_col=score_to_color(sc); is_b=rn==best; b=" b" if is_b else ""
+        cls=("rw " if flip else "")+("rn b" if is_b else "g")
+        name=f'<span class="{cls}" style="--c:{sc_col}">{rn}</span>' if is_b else f'<span class="{cls}">{rn}</span>'
+        score=f'<span class="{"rv" if flip else "rs"}{b}" style="--c:{sc_col}">{int(sc)}</span>'
+        # Right-anchored node: score on left, label on right so it reads toward the pitch
+        lines.append(f'<div class="r x">{score}{name}</div>' if flip else f'<div class="r">{name}{score}</div>')
+    return f'<div class="rl">{"".join(lines)}</div>'
+
+def best_role_html(player,player_index,pct_index=None):
+    scores=_player_role_scores(player,player_index,pct_index)
+    if not scores: return ""
+    best=max(scores,key=scores.get); sc=scores[best]
+    return (f'<div class="r t"><span class="g">{best}</span>'
+            f'<span class="rs b" style="--c:{score_to_color(sc)}">{int(sc)}</span></div>')
+
+# ── SVG pitch lines — dimmed so text always wins ──────────────────────────────
+# Opacity 0.18 so pitch outline is visible as a guide but never overpowers text
+PORTRAIT_SVG="""
+  <rect  x="2"   y="2"     width="96" height="138" fill="none" stroke="#9ca3af" stroke-width="1.2" opacity=".18"/>
+  <line  x1="2"  y1="71"   x2="98"   y2="71"      stroke="#9ca3af" stroke-width=".8"  opacity=".18"/>
+  <circle cx="50" cy="71" r="10"                   fill="none" stroke="#9ca3af" stroke-width=".8"  opacity=".18"/>
+  <circle cx="50" cy="71" r="1.2"                  fill="#9ca3af" opacity=".18"/>
+  <rect  x="22"  y="2"     width="56" height="18"  fill="none" stroke="#9ca3af" stroke-width=".8"  opacity=".18"/>
+  <rect  x="36"  y="2"     width="28" height="7"   fill="none" stroke="#9ca3af" stroke-width=".6"  opacity=".18"/>
+  <circle cx="50" cy="14" r=".9"                   fill="#9ca3af" opacity=".18"/>
+  <rect  x="22"  y="122"   width="56" height="18"  fill="none" stroke="#9ca3af" stroke-width=".8"  opacity=".18"/>
+  <rect  x="36"  y="133"   width="28" height="7"   fill="none" stroke="#9ca3af" stroke-width=".6"  opacity=".18"/>
+  <circle cx="50" cy="126" r=".9"                  fill="#9ca3af" opacity=".18"/>"""
+
+# ── Canva landscape layout constants ─────────────────────────────────────────
+# 1920×1080 slide: portrait pitch centred, players read GK→ST left to right
+# Pitch sits in horizontal centre, rotated 90° to landscape
+# We use a PORTRAIT pitch in the centre of the slide (narrower, taller),
+# with GK at bottom and ST at top, matching Image 3 template style
+# Players are arranged with depth info flanking the pitch
+
+# For the Canva slide we render a landscape SVG pitch occupying most of the slide:
+# Pitch block: 1520px wide × 870px tall, centred in 1920×1080
+CANVA_W, CANVA_H = 1920, 1080
+# Landscape pitch: GK left → ST right, fills almost all slide
+# Tight margins: 40px sides, 80px top/bottom (for legend bar)
+CPX, CPY = 40, 78       # top-left of pitch
+CPW, CPH = 1840, 924    # pitch width × height
+# penalty area proportions
+CP_PAW = round(CPW * 0.11)
+CP_PAH = round(CPH * 0.40)
+CP_GAW = round(CPW * 0.035)
+CP_GAH = round(CPH * 0.22)
+CP_CR  = round(min(CPW,CPH) * 0.08)
+
+def canva_landscape_svg()->str:
+    """Landscape pitch SVG for 1920×1080 canvas"""
+    ox,oy,pw,ph=CPX,CPY,CPW,CPH
+    pa_y=oy+round((ph-CP_PAH)/2); ga_y=oy+round((ph-CP_GAH)/2)
+    cx=ox+pw//2; cy=oy+ph//2
+    return (
+        f'<svg style="position:absolute;left:0;top:0;width:{CANVA_W}px;height:{CANVA_H}px;'
+        f'pointer-events:none;z-index:1;" viewBox="0 0 {CANVA_W} {CANVA_H}">'
+        # pitch fill - subtle green tint
+        f'<rect x="{ox}" y="{oy}" width="{pw}" height="{ph}" fill="#0d1820" opacity=".6"/>'
+        # outer border
+        f'<rect x="{ox}" y="{oy}" width="{pw}" height="{ph}" fill="none" stroke="#374151" stroke-width="2"/>'
+        # halfway line
+        f'<line x1="{cx}" y1="{oy}" x2="{cx}" y2="{oy+ph}" stroke="#374151" stroke-width="1.5"/>'
+        # centre circle
+        f'<circle cx="{cx}" cy="{cy}" r="{CP_CR}" fill="none" stroke="#374151" stroke-width="1.5"/>'
+        f'<circle cx="{cx}" cy="{cy}" r="5" fill="#374151"/>'
+        # left pen area (GK side)
+        f'<rect x="{ox}" y="{pa_y}" width="{CP_PAW}" height="{CP_PAH}" fill="none" stroke="#374151" stroke-width="1.5"/>'
+        f'<rect x="{ox}" y="{ga_y}" width="{CP_GAW}" height="{CP_GAH}" fill="none" stroke="#374151" stroke-width="1"/>'
+        f'<circle cx="{ox+round(CPW*0.08)}" cy="{cy}" r="4" fill="#374151"/>'
+        # right pen area (ST side)
+        f'<rect x="{ox+pw-CP_PAW}" y="{pa_y}" width="{CP_PAW}" height="{CP_PAH}" fill="none" stroke="#374151" stroke-width="1.5"/>'
+        f'<rect x="{ox+pw-CP_GAW}" y="{ga_y}" width="{CP_GAW}" height="{CP_GAH}" fill="none" stroke="#374151" stroke-width="1"/>'
+        f'<circle cx="{ox+pw-round(CPW*0.08)}" cy="{cy}" r="4" fill="#374151"/>'
+        f'</svg>'
+    )
+
+def canva_slot_px(slot_x:float, slot_y:float)->tuple[int,int,str,str]:
+    """Portrait % → landscape px + smart CSS anchor for nodes.
+    Portrait y%: small=attack(ST), large=defence(GK)
+    Landscape: GK → left side (small lx), ST → right side (large lx)
+    Portrait x%: small=left wing (LW), large=right wing (RW)
+    Landscape: LW → top (small ly), RW → bottom (large ly)
+    Returns: (lx, ly, css_transform, text_align)
+    """
+    Y_MIN,Y_MAX=7.0,87.0
+    # Very small inner padding so nodes spread to pitch edges
+    INNER_PAD_X=20   # inset from pitch border for player text
+    INNER_PAD_Y=12
+    lx_pct = 1.0 - (slot_y - Y_MIN) / (Y_MAX - Y_MIN)  # 0=GK-side,1=ST-side
+    lx = CPX + INNER_PAD_X + lx_pct * (CPW - 2*INNER_PAD_X)
+    ly_pct = slot_x / 100.0
+    ly = CPY + INNER_PAD_Y + ly_pct * (CPH - 2*INNER_PAD_Y)
+    # Smart anchor: keep nodes inside pitch boundaries
+    # Horizontal: GK side → text grows right; ST side → text grows left; else centre
+    if lx_pct < 0.12:   tx="translate(0,-50%)";   ta="left"   # GK: anchor left edge
+    elif lx_pct > 0.88: tx="translate(-100%,-50%)"; ta="right"  # ST: anchor right edge
+    else:               tx="translate(-50%,-50%)"; ta="center"
+    # Vertical: top edge → text grows down; bottom → text grows up
+    if ly_pct < 0.12:   tx=tx.replace("-50%)",  "0)")            # top: grow down
+    elif ly_pct > 0.88: tx=tx.replace("-50%)",  "-100%)")        # bottom: grow up
+    return round(lx), round(ly), tx, ta
+
+# ── Fragment cache ────────────────────────────────────────────────────────────
+# Player fields a rendered row or depth card reads; with the display toggles they
+# form the fragment key, so a toggle flip rebuilds only the fragments it touches.
+FRAGMENT_FIELDS=("_key","Player","Team","League","Position","Contract expires","Minutes played",
+                 "Goals","Assists","_primary_pos","_show_pos","Loaned Out","Youth Player",
+                 "On loan","On Loan","on_loan","Loan","loan","On loan?")
+
+def fragment_state(p:dict,player_index=None)->tuple:
+    """FRAGMENT_FIELDS of p. A player missing from the index is scored off its stat line
+    (score_stat_line), so that line is part of its state too."""
+    st=tuple(p.get(k) for k in FRAGMENT_FIELDS)
+    if player_index and p.get("_key") in player_index[0]: return st
+    return (*st,hash(tuple(sorted(stat_line(p).items()))))
+
+class FragmentCache:
+    """LRU of per-player HTML fragments for render_pitch. bind() empties it when the
+    score sources (player/percentile index) or the date (contract years) change."""
+    def __init__(self,max_entries:int=8192):
+        self.max_entries=max_entries; self.hits=0; self.misses=0
+        self._frags:dict[tuple,str]={}; self._src:tuple=(); self._day=None
+    def bind(self,*sources)->None:
+        today=date.today()
+        if today!=self._day or len(sources)!=len(self._src) or any(a is not b for a,b in zip(sources,self._src)):
+            self._frags.clear(); self._src=sources; self._day=today
+    def get(self,key:tuple,build)->str:
+        html=self._frags.pop(key,None)
+        if html is None:
+            self.misses+=1; html=build()
+            if len(self._frags)>=self.max_entries: del self._frags[next(iter(self._frags))]
+        else:
+            self.hits+=1
+        self._frags[key]=html   # re-insert: dicts keep insertion order, so the front is least recent
+        return html
+
+# ── Render pitch ───────────────────────────────────────────────────────────────
+# One shared stylesheet per chart: elements carry short classes plus per-element --c
+# (colour) and position. Font sizes come from --bs/--ns/--ss/--rs (badge, name, stat,
+# role) set by the layout class on the root: .p portrait, .cv Canva 1920×1080.
+PITCH_CSS=(
+    ".dc{font-family:Montserrat,sans-serif;color:#fff;background:#0a0f1c}"
+    ".dc.p{padding:0 4px 10px;--bs:15px;--ns:14px;--ss:9px;--rs:8px}"
+    f".dc.cv{{width:{CANVA_W}px;height:{CANVA_H}px;position:relative;overflow:hidden;"
+    "--bs:32px;--ns:29px;--ss:21px;--rs:20px}"
+    ".dc .tt{font-weight:900;font-size:20px;letter-spacing:.05em;text-transform:uppercase;text-align:center;margin-bottom:4px}"
+    ".dc .hd{display:flex;justify-content:space-between;align-items:baseline;margin-bottom:4px;font-size:9px;color:#6b7280}"
+    ".dc .pf{position:relative;background:#0a0f1c;padding-bottom:142%;overflow:hidden;border:1px solid #1a2540}"
+    ".dc .ps{position:absolute;inset:0;width:100%;height:100%;pointer-events:none;z-index:1}"
+    f".dc .hb{{position:absolute;top:16px;left:{CPX}px;width:{CPW}px;display:flex;justify-content:space-between;"
+    "align-items:center;z-index:20;font-size:21px;color:#6b7280;letter-spacing:.03em}"
+    # nodes and slot badges
+    ".dc .nd{position:absolute;transform:translate(-50%,-50%);text-align:center;min-width:80px;z-index:10}"
+    ".dc .nd.e{max-width:115px}"
+    ".dc .cn{position:absolute;z-index:10}"
+    ".dc .bp{display:inline-block;padding:2px 8px;border:2px solid #ef4444;color:#ef4444;font-size:var(--bs);"
+    "font-weight:900;letter-spacing:.1em;margin-bottom:3px;background:rgba(10,15,28,.97)}"
+    ".dc .bc{display:inline-block;padding:3px 12px;border-radius:8px;background:#b8bfc9;color:#1f2937;"
+    "font-size:var(--bs);font-weight:900;letter-spacing:.07em;margin-bottom:5px;white-space:nowrap}"
+    # player rows (.n portrait, .m Canva; .f = first in slot)
+    ".dc .n{color:var(--c);font-size:var(--ns);line-height:1.45;font-weight:500;margin-top:5px;white-space:nowrap;"
+    "text-shadow:0 0 8px #000,0 0 4px #000}"
+    ".dc .m{color:var(--c);font-size:var(--ns);line-height:1.4;font-weight:400;margin-top:5px;white-space:nowrap;"
+    "text-shadow:0 0 6px #000}"
+    ".dc .n.f{font-weight:800;margin-top:0}.dc .m.f{font-weight:700;margin-top:0}"
+    ".dc .st{color:#fff;font-size:var(--ss);line-height:1.2;opacity:.9}"
+    ".dc .po{color:#9ca3af;font-size:var(--ss);line-height:1.2}"
+    ".dc .sn{color:var(--c);font-size:var(--ns);font-weight:800;letter-spacing:.08em;line-height:1.4;"
+    "text-transform:uppercase;text-shadow:0 0 8px #000}"
+    ".dc.cv .sn{text-shadow:none}.dc .sn.mt{margin-top:4px}"
+    ".dc .su{color:var(--c);font-size:var(--rs);line-height:1.3}"
+    ".dc .em{color:#1f2937;font-size:var(--ss)}.dc.cv .em{color:#4b5563}"
+    # role lines (.x = flipped for right-anchored Canva nodes)
+    ".dc .rl{margin-top:2px}"
+    ".dc .r{display:flex;justify-content:space-between;gap:4px;font-size:var(--rs);line-height:1.4;min-width:90px}"
+    ".dc .r.t{margin-top:2px}"
+    ".dc .r.x{justify-content:flex-end;gap:6px;white-space:nowrap;min-width:0}"
+    ".dc .g{color:#7a8494}.dc .b{font-weight:700}.dc .rn{color:var(--c)}"
+    ".dc .rs{color:var(--c);min-width:22px;text-align:right}"
+    ".dc .rv{color:var(--c);width:22px;text-align:right;flex-shrink:0}"
+    ".dc .rw{min-width:110px}"
+    # depth cards and legend
+    ".dc .dp{margin-top:10px;border-top:1px solid #1f2937;padding-top:8px}"
+    ".dc .dl{font-size:9px;font-weight:800;letter-spacing:.18em;color:#6b7280;margin-bottom:6px;text-align:center}"
+    ".dc .dw{display:flex;flex-wrap:wrap;gap:6px;justify-content:center}"
+    ".dc .dk{background:#0d1220;border:1px solid #1f2937;padding:5px 9px;min-width:100px;text-align:center;flex-shrink:0}"
+    ".dc .dn{color:var(--c);font-size:11px;font-weight:700}"
+    ".dc .dt{color:#6b7280;font-size:7px}"
+    ".dc .lg{text-align:center;font-size:8px;color:#6b7280;margin-top:6px}"
+    ".dc .lk{display:flex;gap:12px;justify-content:center;flex-wrap:wrap;font-size:9px;font-weight:700;margin-top:4px}"
+    ".dc .k{color:var(--c);font-weight:700}"
+)
+
+def render_pitch(
+    team:str, league:str, formation:str,
+    slots:list, slot_map:dict, depth:list, player_index,
+    show_mins:bool, show_goals:bool, show_assists:bool,
+    show_positions:bool, show_roles:bool, xi_only:bool, canva:bool,
+    pitch_width_px:int=560,
+    white_names:bool=False,
+    show_contracts:bool=True,
+    best_role_only:bool=False,
+    pct_index:dict|None=None,
+    new_signing:dict|None=None,
+    hide_pos_override:set|None=None,
+    fragments:"FragmentCache|None"=None,
+)->str:
+    _hpo=hide_pos_override or set()
+    if fragments is not None: fragments.bind(player_index,pct_index)
+    def cached(key:tuple,p:dict,build)->str:
+        return fragments.get((*key,p.get("_key","") in _hpo,fragment_state(p,player_index)),build) if fragments is not None else build()
+
+    # ── per-player fragments ──────────────────────────────────────────────────
+    def roles_html(p,first:bool,flip:bool=False)->str:
+        if not show_roles: return ""
+        if first and not best_role_only: return all_roles_html(p,player_index,flip,pct_index)
+        return best_role_html(p,player_index,pct_index)
+
+    def portrait_row(p,first:bool)->str:
+        col=name_color(p,white_names); suffix=name_suffix(p,show_contracts,_hpo)
+        stats=stat_parts(p,show_mins,show_goals,show_assists)
+        stat_html=f'<div class="st">{" ".join(stats)}</div>' if stats else ""
+        all_pos=", ".join(pos_record(p).toks)
+        pos_html=f'<div class="po">{all_pos}</div>' if (show_positions and all_pos) else ""
+        return (f'<div class="n{" f" if first else ""}" style="--c:{col}">{p["Player"]} {suffix}</div>'
+                f'{pos_html}{stat_html}{roles_html(p,first)}')
+
+    def canva_row(p,first:bool,ta:str)->str:
+        col=name_color(p,white_names); suffix=name_suffix(p,show_contracts,_hpo)
+        return (f'<div class="m{" f" if first else ""}" style="--c:{col}">{p["Player"]}{suffix}</div>'
+                f'{roles_html(p,first,flip=ta=="right")}')
+
+    def depth_card(p)->str:
+        d=player_display(p); yrs=d["_yrs"]
+        rec=pos_record(p); multi="\U0001f501" if rec.multi else ""
+        br=best_role_html(p,player_index,pct_index) if show_roles else ""
+        dep_yr = "L" if d["_loan"] else (f"+{yrs}" if yrs>=0 else "+?")
+        return (f'<div class="dk"><div class="dn" style="--c:{name_color(p,white_names)}">'
+                f'{p["Player"]} {dep_yr} {multi}</div><div class="dt">{rec.tok}</div>{br}</div>')
+
+    def signing_rows(slot,placed:bool)->str:
+        ns=(new_signing or {}).get(slot["id"])
+        if not ns: return ""
+        col=ns.get("color","#ef4444"); sub=ns.get("sub","")
+        return (f'<div class="sn{" mt" if placed else ""}" style="--c:{col}">{ns.get("label","NEW SIGNING") or "NEW SIGNING"}</div>'
+                +(f'<div class="su" style="--c:{col}">{sub}</div>' if sub else ""))
+
+    # ── shared node builder ────────────────────────────────────────────────────
+    def node_rows(slot,row)->str:
+        ps=slot_map.get(slot["id"],[]); ps=ps[:1] if xi_only else ps
+        rows="".join(row(p,i==0) for i,p in enumerate(ps))+signing_rows(slot,bool(ps))
+        return rows or '<div class="em">&#8212;</div>'
+
+    def make_node(slot)->str:
+        # Portrait: edge nodes get a max-width cap so very long names wrap
+        # naturally; short names (J. Key) are never affected since they fit fine.
+        sx=float(slot.get("x",50))
+        rows=node_rows(slot,lambda p,first: cached(("p",first,white_names,show_contracts,show_mins,show_goals,
+                                                    show_assists,show_positions,show_roles,best_role_only),p,
+                                                   lambda: portrait_row(p,first)))
+        return (f'<div class="nd{" e" if (sx<20 or sx>80) else ""}" style="left:{slot["x"]}%;top:{slot["y"]}%">'
+                f'<div class="bp">{slot["label"]}</div><div>{rows}</div></div>')
+
+    # ── legend text ───────────────────────────────────────────────────────────
+    def legend_text()->str:
+        s=""
+        if show_mins:    s+=" \u00b7 \u2032=mins"
+        if show_goals:   s+=" \u00b7 \u26bd=goals"
+        if show_assists: s+=" \u00b7 \U0001f170=assists"
+        return s
+
+    def keys(pairs,sep:str="")->str:
+        return sep.join(f'<span class="k" style="--c:{c}">{k}</span>' for k,c in pairs)
+
+    # ── CANVA mode (1920×1080 landscape) ──────────────────────────────────────
+    # Landscape pitch: GK left → ST right, full-width, smart node anchoring.
+    if canva:
+        def make_canva_node_ls(slot)->str:
+            lx,ly,tx,ta=canva_slot_px(float(slot["x"]),float(slot["y"]))
+            rows=node_rows(slot,lambda p,first: cached(("c",first,ta,white_names,show_contracts,show_roles,best_role_only),p,
+                                                       lambda: canva_row(p,first,ta)))
+            return (f'<div class="cn" style="left:{lx}px;top:{ly}px;transform:{tx};text-align:{ta}">'
+                    f'<div class="bc">{slot["label"]}</div><div>{rows}</div></div>')
+
+        nodes="".join(make_canva_node_ls(s) for s in slots)
+
+        # Legend bar — sits above the pitch (top strip)
+        header=(f'<div class="hb">'
+                f'<span>Name + contract years{legend_text()} &nbsp;·&nbsp; 🔁=4+ positions</span>'
+                f'<span>'+keys((("Under Contract","#fff"),("Out of Contract","#ef4444"),("Final Year","#f59e0b"),
+                                ("On Loan","#22c55e"),("Loaned Out","#eab308"),("Youth","#9ca3af")),"&ensp;")
+                +f'&ensp;<span>{league} · {formation}</span></span></div>')
+
+        return (f'<div id="pitch-root" class="dc cv"><style>{PITCH_CSS}</style>'
+                f'{canva_landscape_svg()}{header}{nodes}</div>')
+
+    # ── PORTRAIT mode ─────────────────────────────────────────────────────────
+    nodes="".join(make_node(s) for s in slots)
+
+    # Portrait SVG — very faint so it never overpowers player text
+    portrait_svg=('<svg class="ps" viewBox="0 0 100 142" preserveAspectRatio="none">'+PORTRAIT_SVG+'</svg>')
+
+    depth_html=""
+    if not xi_only and depth:
+        cards="".join(cached(("d",white_names,show_roles),p,lambda: depth_card(p)) for p in depth)
+        depth_html=f'<div class="dp"><div class="dl">DEPTH</div><div class="dw">{cards}</div></div>'
+
+    title_html=f'<div class="tt">{team} Squad Depth</div>'
+    header_html=f'<div class="hd"><span>{league}</span><span>{formation}</span></div>'
+    legend_bar=(f'<div class="lg">Name + contract years{legend_text()} \u00b7 \U0001f501=4+ positions</div>'
+                f'<div class="lk">'+keys((("Contracted","#fff"),("Final Year","#f59e0b"),("Out of Contract","#ef4444"),
+                                         ("On Loan","#22c55e"),("Loaned Out","#eab308"),("Youth","#9ca3af")))+'</div>')
+
+    # The pitch uses padding-bottom:142% to maintain aspect ratio; standalone pages
+    # override #pitch-field with an explicit height (see make_html_page).
+    return (f'<div id="pitch-root" class="dc p" data-pitch-w="{pitch_width_px}"><style>{PITCH_CSS}</style>'
+            f'{title_html}{header_html}'
+            f'<div id="pitch-field" class="pf">{portrait_svg}{nodes}</div>'
+            f'{depth_html}{legend_bar}</div>')
+
+# ── Native SVG / PNG renderer ─────────────────────────────────────────────────
+# The same chart as render_pitch, laid out as drawing primitives instead of HTML so it
+# can be written as standalone SVG or rasterized server-side with Pillow — no browser,
+# CDN or web font. Primitives: ("rect",x,y,w,h,fill,stroke,sw,opacity,rx)
+# ("line",x1,y1,x2,y2,stroke,sw,opacity) ("circle",cx,cy,r,fill,stroke,sw,opacity)
+# ("text",x,baseline_y,text,size,fill,bold,anchor) with anchor start/middle/end.
+# Emoji have no glyph in system fonts, so stats and the multi-role flag use plain marks.
+NATIVE_MARKS=("′","G","A")
+NATIVE_MULTI=" *"
+NATIVE_FONTS={False:("DejaVuSans.ttf","Arial.ttf"),True:("DejaVuSans-Bold.ttf","Arial Bold.ttf")}
+NATIVE_FONT_FAMILY="Montserrat, 'DejaVu Sans', Arial, sans-serif"
+SCORE_BOX_W=90
+
+@lru_cache(maxsize=64)
+def _native_font(size:int,bold:bool):
+    from PIL import ImageFont
+    for name in NATIVE_FONTS[bold]:
+        try: return ImageFont.truetype(name,size)
+        except OSError: continue
+    return ImageFont.load_default(size)
+
+def _text_w(text:str,size:float,bold:bool=False)->float:
+    try: return _native_font(max(1,round(size)),bold).getlength(text)
+    except ImportError: return len(text)*size*(0.64 if bold else 0.58)
+
+def _svg_prims(svg:str,scale:float=1.0,dx:float=0.0,dy:float=0.0)->list[tuple]:
+    """Scene primitives from the pitch-line SVG snippets used by the HTML renderer."""
+    import xml.etree.ElementTree as ET
+    root=ET.fromstring(svg if svg.lstrip().startswith("<svg") else f"<svg>{svg}</svg>")
+    out=[]
+    for el in root:
+        a=el.attrib; f=lambda k,d=0.0: float(a.get(k,d)); tag=el.tag.rsplit("}",1)[-1]
+        op=f("opacity",1.0); sw=f("stroke-width")*scale
+        fill=a.get("fill","none"); stroke=a.get("stroke","none")
+        if tag=="rect":
+            out.append(("rect",dx+f("x")*scale,dy+f("y")*scale,f("width")*scale,f("height")*scale,fill,stroke,sw,op,0))
+        elif tag=="line":
+            out.append(("line",dx+f("x1")*scale,dy+f("y1")*scale,dx+f("x2")*scale,dy+f("y2")*scale,stroke,sw,op))
+        elif tag=="circle":
+            out.append(("circle",dx+f("cx")*scale,dy+f("cy")*scale,f("r")*scale,fill,stroke,sw,op))
+    return out
+
+def pitch_scene(
+    team:str, league:str, formation:str,
+    slots:list, slot_map:dict, depth:list, player_index,
+    show_mins:bool, show_goals:bool, show_assists:bool,
+    show_positions:bool, show_roles:bool, xi_only:bool, canva:bool,
+    pitch_width_px:int=560,
+    white_names:bool=False,
+    show_contracts:bool=True,
+    best_role_only:bool=False,
+    pct_index:dict|None=None,
+    new_signing:dict|None=None,
+    hide_pos_override:set|None=None,
+)->tuple[int,int,list[tuple]]:
+    """(width, height, primitives) for the chart render_pitch draws; same arguments."""
+    BG="#0a0f1c"; hpo=hide_pos_override or set(); ns_map=new_signing or {}
+    prims:list[tuple]=[]
+
+    def role_lines(p,first:bool,fs:float)->list[list[tuple]]:
+        """One line per role: [(text,size,colour,bold,align)], align "l"/"r" inside the score box."""
+        if not show_roles: return []
+        scores=_player_role_scores(p,player_index,pct_index)
+        if not scores: return []
+        best=max(scores,key=scores.get)
+        if best_role_only or not first:
+            sc=scores[best]; return [[(best,fs,"#7a8494",False,"l"),(str(int(sc)),fs,score_to_color(sc),True,"r")]]
+        out=[]
+        for rn,sc in sorted(scores.items(),key=lambda x:-x[1]):
+            col=score_to_color(sc); b=rn==best
+            out.append([(rn,fs,col if b else "#7a8494",b,"l"),(str(int(sc)),fs,col,b,"r")])
+        return out
+
+    def node_lines(slot,nsz:float,ssz:float,rsz:float,lh_name:float,gap:float)->list[tuple]:
+        """[(height, parts)] for one slot; parts as in role_lines, or a single full-width text."""
+        ps=slot_map.get(slot["id"],[]); ps=ps[:1] if xi_only else ps
+        lines=[]
+        for i,p in enumerate(ps):
+            first=i==0
+            name=f"{p['Player']}{' ' if not canva else ''}{name_suffix(p,show_contracts,hpo,NATIVE_MULTI)}"
+            lines.append((nsz*lh_name+(0 if first else gap),[(name,nsz,name_color(p,white_names),first,"c")]))
+            if not canva:
+                if show_positions and pos_record(p).toks:
+                    lines.append((ssz*1.2,[(", ".join(pos_record(p).toks),ssz,"#9ca3af",False,"c")]))
+                st_=stat_parts(p,show_mins,show_goals,show_assists,NATIVE_MARKS)
+                if st_: lines.append((ssz*1.2,[(" ".join(st_),ssz,"#ffffff",False,"c")]))
+            lines+=[(rsz*1.4,ln) for ln in role_lines(p,first,rsz)]
+        ns=ns_map.get(slot["id"])
+        if ns:
+            col=ns.get("color","#ef4444")
+            lines.append((nsz*1.4,[((ns.get("label","NEW SIGNING") or "NEW SIGNING").upper(),nsz,col,True,"c")]))
+            if ns.get("sub"): lines.append((rsz*1.3,[(ns["sub"],rsz,col,False,"c")]))
+        if not ps and not ns:
+            lines.append((ssz*1.4,[("—",ssz,"#1f2937" if not canva else "#4b5563",False,"c")]))
+        return lines
+
+    def draw_lines(lines,x:float,top:float,anchor:str):
+        """Stack lines from top; x is the centre, left or right edge per anchor. Role rows
+        share one column as wide as the widest (min SCORE_BOX_W), like the flex rows."""
+        box_w=max([SCORE_BOX_W]+[_text_w(l[0],l[1],l[3])+4+max(22,_text_w(r[0],r[1],r[3]))
+                                 for _,parts in lines if len(parts)==2 for l,r in (parts,)])
+        y=top
+        for h,parts in lines:
+            base=y+h*0.78
+            if len(parts)==1 and parts[0][4]=="c":
+                t,fs,col,b,_=parts[0]; prims.append(("text",x,base,t,fs,col,b,anchor))
+            else:
+                x0=x-box_w/2 if anchor=="middle" else x if anchor=="start" else x-box_w
+                for t,fs,col,b,al in parts:
+                    prims.append(("text",x0 if al=="l" else x0+box_w,base,t,fs,col,b,"start" if al=="l" else "end"))
+            y+=h
+
+    def legend_marks()->str:
+        s=""
+        if show_mins:    s+=f" · {NATIVE_MARKS[0]}=mins"
+        if show_goals:   s+=f" · {NATIVE_MARKS[1]}=goals"
+        if show_assists: s+=f" · {NATIVE_MARKS[2]}=assists"
+        return s
+
+    def colour_keys(x:float,y:float,fs:float,anchor:str,keys:list[tuple[str,str]],gap:float):
+        """Row of coloured legend words, centred on or ending at x."""
+        ws=[_text_w(k,fs,True) for k,_ in keys]; total=sum(ws)+gap*(len(keys)-1)
+        cx=x-total/2 if anchor=="middle" else x-total
+        for (k,col),w in zip(keys,ws):
+            prims.append(("text",cx,y,k,fs,col,True,"start")); cx+=w+gap
+
+    if canva:
+        W,H=CANVA_W,CANVA_H
+        prims.append(("rect",0,0,W,H,BG,"none",0,1.0,0))
+        prims+=_svg_prims(canva_landscape_svg())
+        keys=[("Under Contract","#ffffff"),("Out of Contract","#ef4444"),
+              ("Final Year","#f59e0b"),("On Loan","#22c55e"),("Loaned Out","#eab308"),("Youth","#9ca3af"),
+              (f"{league} · {formation}","#6b7280")]
+        note=f"Name + contract years{legend_marks()} · *=4+ positions"
+        need=_text_w(note,21)+sum(_text_w(k,21,True)+18 for k,_ in keys)+24
+        lfs=min(21.0,21*CPW/need)   # the HTML header wraps; shrink to one line instead
+        prims.append(("text",CPX,38,note,lfs,"#6b7280",False,"start"))
+        colour_keys(CPX+CPW,38,lfs,"end",keys,18*lfs/21)
+        bsz,nsz,ssz,rsz=32,29,21,20
+        for slot in slots:
+            lx,ly,tx,ta=canva_slot_px(float(slot["x"]),float(slot["y"]))
+            lines=node_lines(slot,nsz,ssz,rsz,1.4,5)
+            bw=_text_w(slot["label"],bsz,True)+24; bh=bsz*1.3
+            h=bh+5+sum(l[0] for l in lines)
+            top=ly-h/2 if tx.endswith("-50%)") else ly if tx.endswith(",0)") else ly-h
+            anchor={"left":"start","right":"end"}.get(ta,"middle")
+            bx=lx-bw/2 if anchor=="middle" else lx if anchor=="start" else lx-bw
+            prims.append(("rect",bx,top,bw,bh,"#b8bfc9","none",0,1.0,8))
+            prims.append(("text",bx+bw/2,top+bh*0.76,slot["label"],bsz,"#1f2937",True,"middle"))
+            draw_lines(lines,lx,top+bh+5,anchor)
+        return W,H,prims
+
+    # Portrait: title, header, pitch field (1.42 × width), depth cards, legend
+    W=pitch_width_px; FY=58; FH=round(W*1.42); u=W/100
+    bsz,nsz,ssz,rsz=15,14,9,8
+    body:list[tuple]=[]
+    body.append(("text",W/2,26,f"{team} Squad Depth".upper(),20,"#ffffff",True,"middle"))
+    body.append(("text",6,48,str(league),9,"#6b7280",False,"start"))
+    body.append(("text",W-6,48,str(formation),9,"#6b7280",False,"end"))
+    body.append(("rect",0,FY,W,FH,BG,"#1a2540",1,1.0,0))
+    body+=_svg_prims(PORTRAIT_SVG,u,0,FY)
+    prims=body
+    for slot in slots:
+        cx=float(slot["x"])*u; cy=FY+float(slot["y"])/100*FH
+        lines=node_lines(slot,nsz,ssz,rsz,1.45,5)
+        bw=_text_w(slot["label"],bsz,True)+20; bh=bsz*1.45
+        h=bh+3+sum(l[0] for l in lines); top=cy-h/2
+        prims.append(("rect",cx-bw/2,top,bw,bh,"#0a0f1c","#ef4444",2,0.97,0))
+        prims.append(("text",cx,top+bh*0.76,slot["label"],bsz,"#ef4444",True,"middle"))
+        draw_lines(lines,cx,top+bh+3,"middle")
+    y=FY+FH+10
+    if not xi_only and depth:
+        prims.append(("line",0,y,W,y,"#1f2937",1,1.0))
+        prims.append(("text",W/2,y+18,"DEPTH",9,"#6b7280",True,"middle"))
+        cw,ch,gap=130,46 if show_roles else 34,6
+        per=max(1,int((W+gap)//(cw+gap))); y+=26
+        for r in range(0,len(depth),per):
+            row=depth[r:r+per]; x=(W-(len(row)*(cw+gap)-gap))/2
+            for p in row:
+                d=player_display(p); yrs=d["_yrs"]
+                dep_yr="L" if d["_loan"] else (f"+{yrs}" if yrs>=0 else "+?")
+                rec=pos_record(p)
+                prims.append(("rect",x,y,cw,ch,"#0d1220","#1f2937",1,1.0,0))
+                prims.append(("text",x+cw/2,y+15,f"{p['Player']} {dep_yr}{NATIVE_MULTI if rec.multi else ''}",
+                              11,name_color(p,white_names),True,"middle"))
+                prims.append(("text",x+cw/2,y+26,rec.tok,7,"#6b7280",False,"middle"))
+                rl=role_lines(p,False,8)
+                if rl: draw_lines([(11,rl[0])],x+cw/2,y+30,"middle")
+                x+=cw+gap
+            y+=ch+gap
+    y+=14
+    prims.append(("text",W/2,y,f"Name + contract years{legend_marks()} · *=4+ positions",8,"#6b7280",False,"middle"))
+    colour_keys(W/2,y+15,9,"middle",[("Contracted","#ffffff"),("Final Year","#f59e0b"),("Out of Contract","#ef4444"),
+                ("On Loan","#22c55e"),("Loaned Out","#eab308"),("Youth","#9ca3af")],12)
+    H=round(y+26)
+    return W,H,[("rect",0,0,W,H,BG,"none",0,1.0,0),*prims]
+
+def scene_svg(scene:tuple[int,int,list])->str:
+    """Standalone SVG document for a pitch_scene."""
+    from html import escape
+    W,H,prims=scene; out=[]
+    n=lambda v: f"{v:.2f}".rstrip("0").rstrip(".")
+    for pr in prims:
+        k=pr[0]
+        if k=="rect":
+            _,x,y,w,h,fill,stroke,sw,op,rx=pr
+            rxa=f' rx="{n(rx)}"' if rx else ""
+            out.append(f'<rect x="{n(x)}" y="{n(y)}" width="{n(w)}" height="{n(h)}" fill="{fill}" stroke="{stroke}" '
+                       f'stroke-width="{n(sw)}" opacity="{n(op)}"{rxa}/>')
+        elif k=="line":
+            _,x1,y1,x2,y2,stroke,sw,op=pr
+            out.append(f'<line x1="{n(x1)}" y1="{n(y1)}" x2="{n(x2)}" y2="{n(y2)}" stroke="{stroke}" '
+                       f'stroke-width="{n(sw)}" opacity="{n(op)}"/>')
+        elif k=="circle":
+            _,cx,cy,r,fill,stroke,sw,op=pr
+            out.append(f'<circle cx="{n(cx)}" cy="{n(cy)}" r="{n(r)}" fill="{fill}" stroke="{stroke}" '
+                       f'stroke-width="{n(sw)}" opacity="{n(op)}"/>')
+        else:
+            _,x,y,t,fs,fill,bold,anchor=pr
+            fw=' font-weight="700"' if bold else ""
+            out.append(f'<text x="{n(x)}" y="{n(y)}" font-size="{n(fs)}" fill="{fill}" text-anchor="{anchor}"{fw}>'
+                       f'{escape(t)}</text>')
+    return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{W}" height="{H}" viewBox="0 0 {W} {H}" '
+            f'font-family="{NATIVE_FONT_FAMILY}">{"".join(out)}</svg>')
+
+def scene_png(scene:tuple[int,int,list],scale:float=2.0)->bytes:
+    """Rasterize a pitch_scene to PNG bytes with Pillow (a Streamlit dependency)."""
+    from PIL import Image, ImageColor, ImageDraw
+    W,H,prims=scene; S=scale
+    img=Image.new("RGB",(round(W*S),round(H*S)),"#0a0f1c")
+    d=ImageDraw.Draw(img,"RGBA")   # RGBA pen on an RGB canvas blends the faint pitch lines
+    def rgba(c:str,op:float):
+        if c in ("none",None): return None
+        r,g,b,*a=ImageColor.getrgb(c); return (r,g,b,round((a[0] if a else 255)*op))
+    width=lambda sw: max(1,round(sw*S)) if sw else 0
+    for pr in prims:
+        k=pr[0]
+        if k=="rect":
+            _,x,y,w,h,fill,stroke,sw,op,rx=pr
+            box=[x*S,y*S,(x+w)*S,(y+h)*S]
+            if rx: d.rounded_rectangle(box,rx*S,fill=rgba(fill,op),outline=rgba(stroke,op),width=width(sw))
+            else:  d.rectangle(box,fill=rgba(fill,op),outline=rgba(stroke,op),width=width(sw))
+        elif k=="line":
+            _,x1,y1,x2,y2,stroke,sw,op=pr
+            d.line([x1*S,y1*S,x2*S,y2*S],fill=rgba(stroke,op),width=width(sw))
+        elif k=="circle":
+            _,cx,cy,r,fill,stroke,sw,op=pr
+            d.ellipse([(cx-r)*S,(cy-r)*S,(cx+r)*S,(cy+r)*S],fill=rgba(fill,op),outline=rgba(stroke,op),width=width(sw))
+        else:
+            _,x,y,t,fs,fill,bold,anchor=pr
+            d.text((x*S,y*S),t,fill=rgba(fill,1.0),font=_native_font(max(1,round(fs*S)),bold),
+                   anchor={"start":"ls","middle":"ms","end":"rs"}[anchor])
+    buf=io.BytesIO(); img.save(buf,"PNG",compress_level=1)   # ~20% larger, ~40% faster
+    return buf.getvalue()
+
+def render_pitch_svg(*args,**kw)->str:
+    """render_pitch's chart as a standalone SVG document (same arguments)."""
+    return scene_svg(pitch_scene(*args,**kw))
+
+def render_pitch_png(*args,scale:float=2.0,**kw)->bytes:
+    """render_pitch's chart as PNG bytes, rendered server-side (same arguments, plus scale)."""
+    return scene_png(pitch_scene(*args,**kw),scale)
+
+# ── HTML wrapper for standalone download ─────────────────────────────────────
+FONT_URL="https://fonts.googleapis.com/css2?family=Montserrat:wght@400;500;600;700;800;900&display=swap"
+def make_mobile_html_page(pitch_html:str, team:str)->str:
+    """Full-size pitch optimised for iPhone Safari — viewport meta, full-width."""
+    BG="#0a0f1c"
+    return f"""<!DOCTYPE html>
+<html><head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0">
+<title>{team} Squad Depth</title>
+<style>
+@import url('{FONT_URL}');
+*{{box-sizing:border-box;margin:0;padding:0}}
+body{{background:{BG};font-family:Montserrat,sans-serif;overflow-x:hidden;}}
+#pitch-root{{width:100vw!important;padding:0!important;}}
+#pitch-field{{height:calc(100vw * 1.42)!important;padding-bottom:0!important;}}
+</style></head>
+<body>{pitch_html}</body></html>"""
+
+def make_html_page(pitch_html:str, team:str, canva:bool, pitch_w:int=560)->str:
+    """Standalone HTML page that renders identically to Streamlit."""
+    BG="#0a0f1c"
+    if canva:
+        body_style=(f"margin:0;background:{BG};font-family:Montserrat,sans-serif;"
+                    f"display:flex;justify-content:center;align-items:flex-start;")
+        wrap_style="display:inline-block;"
+    else:
+        body_style=f"margin:0;background:{BG};font-family:Montserrat,sans-serif;"
+        # Fix pitch-field: replace padding-bottom trick with explicit height for standalone
+        wrap_style=f"width:{pitch_w}px;margin:0 auto;padding:8px;"
+    page_fix_css=""
+    if not canva:
+        # Force pitch-field to explicit height so it renders correctly in browsers
+        page_fix_css=f"#pitch-field{{height:{round(pitch_w*1.45)}px!important;padding-bottom:0!important;}}"
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{team} Squad Depth</title>
+<style>
+@import url('{FONT_URL}');
+*{{box-sizing:border-box;margin:0;padding:0}}
+body{{{body_style}}}
+{page_fix_css}
+</style></head>
+<body><div style="{wrap_style}">{pitch_html}</div></body></html>"""
+
+# ── Download payloads ─────────────────────────────────────────────────────────
+# Built only when a download is requested and kept per (pitch HTML, export mode), so an
+# unchanged chart is never rebuilt or re-encoded across reruns.
+DOWNLOAD_KINDS=("html","png","mobile")
+
+def payload_key(pitch_html:str,kind:str,canva:bool,pitch_w:int)->str:
+    """Content hash of a download: the rendered pitch plus everything the wrapper adds."""
+    h=hashlib.blake2b(pitch_html.encode(),digest_size=16)
+    h.update(f"|{kind}|{int(canva)}|{pitch_w}".encode())
+    return h.hexdigest()
+
+class PayloadCache:
+    """Small LRU of encoded download payloads by payload_key. Thread-safe: Streamlit runs
+    deferred download callables off the script thread."""
+    def __init__(self,max_entries:int=12):
+        self.max_entries=max_entries; self.hits=0; self.misses=0
+        self._data:dict[str,bytes]={}; self._lock=threading.Lock()
+    def get(self,key:str,build)->bytes:
+        with self._lock:
+            data=self._data.pop(key,None)
+            if data is not None:
+                self.hits+=1; self._data[key]=data; return data
+        data=build(); data=data.encode("utf-8") if isinstance(data,str) else data
+        with self._lock:
+            self.misses+=1; self._data.pop(key,None)
+            while len(self._data)>=self.max_entries: del self._data[next(iter(self._data))]
+            self._data[key]=data
+        return data
+    def deferred(self,key:str,build):
+        """Zero-argument callable for st.download_button(data=...)."""
+        return lambda: self.get(key,build)
+
+# ── League pack (ZIP) ─────────────────────────────────────────────────────────
+def team_slug(team:str)->str: return re.sub(r"[^\w\-]+","_",team).strip("_") or "team"
+
+PACK_DISPLAY=(True,True,True,False,True,False)   # mins, goals, assists, positions, roles, XI only
+
+def team_pack_files(team:str,players:list,player_index,formation:str="4-2-3-1",mode:str="greedy",
+                    canva:bool=False,png:bool=False,pitch_w:int=700,pct_index=None,
+                    display:tuple=PACK_DISPLAY)->list[tuple[str,bytes]]:
+    """Assign and render one team through render_pitch + make_html_page (and render_pitch_png
+    with png): [(file name, bytes)]. display holds render_pitch's show_* / xi_only flags."""
+    sm,dep=assign_players([dict(p) for p in players],formation,mode,player_index)
+    args=(team,str(players[0].get("League","")) if players else "",formation,FORMATIONS[formation],
+          sm,dep,player_index,*display,canva,pitch_w)
+    slug=team_slug(team)
+    files=[(f"{slug}.html",make_html_page(render_pitch(*args,pct_index=pct_index),team,canva,pitch_w).encode())]
+    if png: files.append((f"{slug}.png",render_pitch_png(*args,pct_index=pct_index,scale=1 if canva else 2)))
+    return files
+
+def bounded_map(ex,fn,items,window:int):
+    """ex.map(fn, items) in order, but with at most `window` tasks submitted ahead of the
+    consumer, so finished results never pile up in memory."""
+    it=iter(items); pending=deque(ex.submit(fn,x) for _,x in zip(range(max(1,window)),it))
+    while pending:
+        res=pending.popleft().result()
+        for x in it: pending.append(ex.submit(fn,x)); break
+        yield res
+
+def stream_zip(out,batches,total:int=0,progress=None)->int:
+    """Write each [(name, bytes)] batch into a ZIP at out (path or binary file) as it arrives.
+    PNGs are stored (already compressed), everything else deflated; progress(done, total)
+    after each batch. Returns the number of entries."""
+    n=0
+    with zipfile.ZipFile(out,"w",zipfile.ZIP_DEFLATED) as zf:
+        for done,files in enumerate(batches,1):
+            for name,data in files:
+                zf.writestr(name,data,zipfile.ZIP_STORED if name.endswith(".png") else zipfile.ZIP_DEFLATED); n+=1
+            if progress: progress(done,total)
+    return n
+
+def write_league_pack(out,records:dict[str,list[dict]],player_index,formation:str="4-2-3-1",
+                      mode:str="greedy",canva:bool=False,png:bool=False,pitch_w:int=700,
+                      pct_index=None,display:tuple=PACK_DISPLAY,progress=None)->int:
+    """Every team in records (team → player dicts, e.g. team_records) rendered one at a time
+    on the calling thread and streamed into one ZIP, so only one team's files are in memory.
+    Rendering is GIL-bound, so this is not parallel; export.py --zip runs the same
+    team_pack_files on a process pool for that."""
+    teams=sorted(records)
+    render=lambda t: team_pack_files(t,records[t],player_index,formation,mode,canva,png,pitch_w,pct_index,display)
+    return stream_zip(out,map(render,teams),len(teams),progress)
@@ -0,0 +1,112 @@
+"""
+Squad Depth Chart — headless bulk export
+python export.py EFLSCOTFEB26.csv --league "England. League One" --formation 4-3-3 --out charts/
+python export.py WORLDaJan26.csv --canva --png --workers 8
+python export.py EFLSCOTFEB26.csv --league "Scotland. Premiership" --png --zip scotland.zip
+
+Renders one standalone HTML page per team (plus a server-side rendered PNG with --png)
+on a process pool and prints per-team timings; timings.json lands next to the pages.
+With --zip the files are streamed into one archive (a "league pack") instead.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from depth_chart import (
+    ASSIGN_MODES, FORMATIONS, bounded_map, build_player_index, load_dataset, scores_from_cache,
+    stream_zip, team_pack_files, team_records,
+)
+
+PORTRAIT_W=700
+_job:dict={}   # per-worker state, filled once by _init_worker
+
+def _init_worker(job:dict)->None:
+    _job.clear(); _job.update(job)
+
+def render_team(team:str)->tuple[list[tuple[str,bytes]],float]:
+    """One team's (file name, bytes) pairs and render seconds; runs inside a pool worker."""
+    j=_job; t=time.perf_counter()
+    files=team_pack_files(team,j["records"][team],j["player_index"],j["formation"],j["mode"],
+                          j["canva"],j["png"],PORTRAIT_W)
+    return files,time.perf_counter()-t
+
+def export_team(team:str)->dict:
+    """Assign, render and write one team's page(s); runs inside a pool worker."""
+    files,secs=render_team(team)
+    written=[]
+    for name,data in files:
+        path=os.path.join(_job["out"],name)
+        with open(path,"wb") as f: f.write(data)
+        written.append(path)
+    return {"team":team,"seconds":secs,"files":written,"bytes":sum(len(d) for _,d in files)}
+
+def _pack_team(team:str)->list[tuple[str,bytes]]:
+    return render_team(team)[0]
+
+def _load_job(src:str,out:str,league:str|None,formation:str,mode:str,min_minutes:float,
+              canva:bool,png:bool)->dict:
+    with open(src,"rb") as f: raw=f.read()
+    df=load_dataset(raw)
+    pidx=build_player_index(df,scores_from_cache(df,hashlib.sha256(raw).hexdigest()))
+    if league is not None: df=df[df["League"]==league]
+    if min_minutes: df=df[df["Minutes played"]>=min_minutes]
+    return {"records":team_records(df),"player_index":pidx,"formation":formation,"mode":mode,
+            "canva":canva,"png":png,"out":out}
+
+def export_all(src:str,out:str,league:str|None=None,formation:str="4-2-3-1",mode:str="greedy",
+               min_minutes:float=0,canva:bool=False,png:bool=False,workers:int|None=None)->list[dict]:
+    """Render every team in src (optionally one league) into out; returns per-team timings."""
+    job=_load_job(src,out,league,formation,mode,min_minutes,canva,png)
+    os.makedirs(out,exist_ok=True)
+    teams=sorted(job["records"])
+    with ProcessPoolExecutor(max_workers=workers,initializer=_init_worker,initargs=(job,)) as ex:
+        return list(ex.map(export_team,teams,chunksize=max(1,len(teams)//(4*(workers or os.cpu_count() or 1)))))
+
+def export_zip(src:str,zip_path:str,league:str|None=None,formation:str="4-2-3-1",mode:str="greedy",
+               min_minutes:float=0,canva:bool=False,png:bool=False,workers:int|None=None,
+               progress=None)->int:
+    """League pack: every team's files streamed into one ZIP as the pool finishes them, with
+    at most two teams per worker held in memory. Returns the number of entries."""
+    job=_load_job(src,"",league,formation,mode,min_minutes,canva,png)
+    teams=sorted(job["records"]); w=workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=w,initializer=_init_worker,initargs=(job,)) as ex:
+        return stream_zip(zip_path,bounded_map(ex,_pack_team,teams,2*w),len(teams),progress)
+
+def _progress(done:int,total:int)->None:
+    sys.stderr.write(f"\r{done}/{total} teams"); sys.stderr.flush()
+    if done==total: sys.stderr.write("\n")
+
+def main(argv=None)->list[dict]:
+    ap=argparse.ArgumentParser(description=__doc__,formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("dataset")
+    ap.add_argument("--league",help="only this league (default: every team in the file)")
+    ap.add_argument("--formation",default="4-2-3-1",choices=list(FORMATIONS))
+    ap.add_argument("--mode",default="greedy",choices=ASSIGN_MODES)
+    ap.add_argument("--min-minutes",type=float,default=0)
+    ap.add_argument("--canva",action="store_true",help="1920x1080 landscape layout")
+    ap.add_argument("--png",action="store_true",help="also write a PNG rendered server-side")
+    ap.add_argument("--workers",type=int,default=None)
+    ap.add_argument("--out",default="depth_charts")
+    ap.add_argument("--zip",metavar="PATH",help="stream every team into one ZIP at PATH instead of --out")
+    a=ap.parse_args(argv)
+    t=time.perf_counter()
+    if a.zip:
+        n=export_zip(a.dataset,a.zip,a.league,a.formation,a.mode,a.min_minutes,a.canva,a.png,a.workers,_progress)
+        if not n: os.remove(a.zip); ap.exit(1,f"no teams found{f' in league {a.league!r}' if a.league else ''}\n")
+        print(f"{n} files -> {a.zip} ({os.path.getsize(a.zip)/1024:.0f} KB) in {time.perf_counter()-t:.2f}s")
+        return []
+    res=export_all(a.dataset,a.out,a.league,a.formation,a.mode,a.min_minutes,a.canva,a.png,a.workers)
+    wall=time.perf_counter()-t
+    if not res: ap.exit(1,f"no teams found{f' in league {a.league!r}' if a.league else ''}\n")
+    w=max(len(r["team"]) for r in res)
+    for r in res: print(f"{r['team']:<{w}}  {r['seconds']*1000:7.1f}ms  {r['bytes']/1024:6.0f} KB")
+    print(f"{len(res)} teams -> {a.out}/ in {wall:.2f}s")
+    with open(os.path.join(a.out,"timings.json"),"w") as f:
+        json.dump({"wall_seconds":wall,"teams":res},f,indent=2)
+    return res
+
+if __name__=="__main__":
+    main()